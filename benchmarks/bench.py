@@ -0,0 +1,231 @@
+#!/usr/bin/env python
+
+"""
+Throughput benchmarks for the FixedWidth hot paths.
+
+Generates reproducible fixtures for several layouts and times parsing,
+building, validation and whole-file streaming, writing one JSON object
+per result to stdout (or --output), e.g.:
+
+    python benchmarks/bench.py --records 10000 100000 --layouts narrow wide
+
+Each result has the benchmark and layout names, the number of records,
+the elapsed seconds, records/sec and, unless --no-memory is given, the
+peak memory traced while repeating the run under tracemalloc.
+"""
+import argparse
+import datetime
+import io
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from decimal import Decimal
+from itertools import cycle, islice
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from fixedwidth.fixedwidth import FixedWidth  # noqa: E402
+
+#field types (and lengths) repeated to make up each layout
+LAYOUTS = {
+    'narrow': [('integer', 8), ('string', 20), ('decimal', 12), ('date', 8), ('numeric', 4)],
+    'wide': [('string', 6), ('integer', 4), ('decimal', 10), ('numeric', 3), ('date', 8)] * 60,
+    'string': [('string', 15)] * 20,
+    'decimal': [('decimal', 12)] * 20,
+    'date': [('date', 8)] * 20,
+}
+
+#number of distinct records generated; benchmarks cycle through them
+POOL_SIZE = 1000
+
+
+def make_config(layout):
+
+    """
+    Returns a FixedWidth config for the named layout.
+    """
+
+    config = {}
+    start_pos = 1
+    for index, (field_type, length) in enumerate(LAYOUTS[layout]):
+        field = {
+            'required': True,
+            'type': field_type,
+            'start_pos': start_pos,
+            'length': length,
+            'alignment': 'left' if field_type == 'string' else 'right',
+            'padding': ' ',
+        }
+        if field_type == 'decimal':
+            field['precision'] = 2
+        elif field_type == 'date':
+            field['format'] = '%Y%m%d'
+        config['%s_%03d' % (field_type, index)] = field
+        start_pos += length
+    return config
+
+
+def make_record(config, rand):
+
+    """
+    Returns a random record that fits 'config'.
+    """
+
+    record = {}
+    for field_name, field in config.items():
+        length = field['length']
+        if field['type'] == 'string':
+            record[field_name] = ''.join(
+                rand.choice('ABCDEFGHIJKLMNOPQRSTUVWXYZ ') for _ in range(length)).strip()
+        elif field['type'] == 'integer':
+            record[field_name] = rand.randint(0, 10 ** (length - 1))
+        elif field['type'] == 'decimal':
+            record[field_name] = Decimal(rand.randint(0, 10 ** (length - 2))).scaleb(-2)
+        elif field['type'] == 'numeric':
+            record[field_name] = str(rand.randint(0, 10 ** length - 1)).zfill(length)
+        else:
+            record[field_name] = datetime.datetime(2020, 1, 1) + \
+                datetime.timedelta(days=rand.randint(0, 3650))
+    return record
+
+
+def bench_line_setter(fw, records, lines, count):
+    for line in islice(cycle(lines), count):
+        fw.line = line
+
+
+def bench_line_getter(fw, records, lines, count):
+    for record in islice(cycle(records), count):
+        fw.data = record
+        fw.line
+
+
+def bench_validate(fw, records, lines, count):
+    for record in islice(cycle(records), count):
+        fw.data = record
+        fw.validate()
+
+
+def bench_format_field(fw, records, lines, count):
+    names = [x[1] for x in fw.ordered_fields]
+    for record in islice(cycle(records), count):
+        fw.data = record
+        for field_name in names:
+            fw._format_field(field_name)
+
+
+def bench_emit_file(fw, records, lines, count):
+    with tempfile.TemporaryFile('w', newline='') as outfile:
+        fw.write_records(islice(cycle(records), count), outfile)
+
+
+def bench_parse_file(fw, records, lines, count, path):
+    with io.open(path, newline='') as infile:
+        for _ in fw.iter_records(infile):
+            pass
+
+
+BENCHMARKS = [
+    ('line_setter', bench_line_setter),
+    ('line_getter', bench_line_getter),
+    ('validate', bench_validate),
+    ('format_field', bench_format_field),
+    ('emit_file', bench_emit_file),
+    ('parse_file', bench_parse_file),
+]
+
+
+def measure(function, args, memory):
+
+    """
+    Returns the elapsed seconds for function(*args) and, if 'memory' is
+    true, the peak traced memory of a second run.
+    """
+
+    start = time.perf_counter()
+    function(*args)
+    seconds = time.perf_counter() - start
+
+    peak = None
+    if memory:
+        tracemalloc.start()
+        function(*args)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return seconds, peak
+
+
+def run(layouts, counts, benchmarks, memory, seed):
+
+    """
+    Yields a result dict for each benchmark, layout and record count.
+    """
+
+    for layout in layouts:
+        config = make_config(layout)
+        fw = FixedWidth(config)
+        rand = random.Random(seed)
+        records = [make_record(config, rand) for _ in range(POOL_SIZE)]
+        lines = [fw.layout.render(x) for x in records]
+        record_size = fw.layout.record_length + len(fw.line_end)
+
+        for count in counts:
+            fd, path = tempfile.mkstemp(suffix='.txt')
+            try:
+                with io.open(fd, 'w', newline='') as outfile:
+                    fw.write_records(islice(cycle(records), count), outfile)
+
+                for name, function in BENCHMARKS:
+                    if benchmarks and name not in benchmarks:
+                        continue
+                    args = [fw, records, lines, count]
+                    if name == 'parse_file':
+                        args.append(path)
+                    seconds, peak = measure(function, args, memory)
+                    yield {
+                        'benchmark': name,
+                        'layout': layout,
+                        'fields': len(config),
+                        'records': count,
+                        'seconds': round(seconds, 6),
+                        'records_per_second': round(count / seconds, 1),
+                        'bytes_per_second': round(count * record_size / seconds, 1),
+                        'peak_memory_bytes': peak,
+                        'python': platform.python_version(),
+                    }
+            finally:
+                os.remove(path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--records', type=int, nargs='+', default=[10000],
+                        help='record counts to run (default: 10000)')
+    parser.add_argument('--layouts', nargs='+', choices=sorted(LAYOUTS),
+                        default=sorted(LAYOUTS), help='layouts to run (default: all)')
+    parser.add_argument('--benchmarks', nargs='+', choices=[x[0] for x in BENCHMARKS],
+                        help='benchmarks to run (default: all)')
+    parser.add_argument('--no-memory', action='store_true',
+                        help='skip the tracemalloc pass that measures peak memory')
+    parser.add_argument('--seed', type=int, default=0, help='random seed (default: 0)')
+    parser.add_argument('--output', help='write results here instead of stdout')
+    args = parser.parse_args(argv)
+
+    output = open(args.output, 'w') if args.output else sys.stdout
+    try:
+        for result in run(args.layouts, args.records, args.benchmarks,
+                          not args.no_memory, args.seed):
+            output.write(json.dumps(result, sort_keys=True) + '\n')
+            output.flush()
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+"""
+Single-pass totals of fixed-width files: counts, sums, minimums and
+maximums of fields, optionally grouped by other fields.
+"""
+from collections import namedtuple
+
+from six import string_types
+
+from .fixedwidth import CHUNK_SIZE
+
+Aggregate = namedtuple('Aggregate', ['count', 'sums', 'minimums', 'maximums'])
+
+#kinds of running total
+_SUM, _MIN, _MAX = range(3)
+
+
+def aggregate(fw, fileobj, sums=(), minimums=(), maximums=(), group_by=None,
+              chunk_size=CHUNK_SIZE):
+
+    """
+    Reads 'fileobj' like FixedWidth.iter_records and returns an Aggregate
+    (count, sums, minimums, maximums) of its records, where sums, minimums
+    and maximums are dicts of field name -> total for the field names in
+    'sums', 'minimums' and 'maximums'.
+
+    If 'group_by' is a field name, or a list of them, returns a dict of
+    group value (a tuple for a list) -> Aggregate instead.
+
+    Only the fields involved are sliced and converted, and no dict is
+    built per record. Empty fields with a default of None are skipped;
+    sums of Decimal and integer fields are exact. Records are grouped by
+    their raw group slices, which are converted once per group at the end.
+
+    Example:
+        totals = aggregate(fw, infile, sums=['amount'], group_by='branch')
+        for branch, total in sorted(totals.items()):
+            print(branch, total.count, total.sums['amount'])
+    """
+
+    layout = fw.layout
+    names = []
+    for name in tuple(sums) + tuple(minimums) + tuple(maximums):
+        if name not in names:
+            names.append(name)
+    keys = []
+    if group_by is not None:
+        keys = [group_by] if isinstance(group_by, string_types) else list(group_by)
+    # fail early on unknown field names
+    layout.projection(names + keys)
+
+    slots = [(_SUM, x) for x in sums] + [(_MIN, x) for x in minimums] + \
+        [(_MAX, x) for x in maximums]
+    lines, binary = fw._read_lines(fileobj, chunk_size)
+    field_map = layout.field_map(None, binary)
+    whitespace = layout.whitespace if binary else None
+
+    plan = []
+    for name in names:
+        start, end, convert, has_default, default = field_map[name]
+        ops = tuple((kind, slot) for slot, (kind, x) in enumerate(slots, 1) if x == name)
+        plan.append((start, end, convert, has_default, default, ops))
+    plan = tuple(plan)
+    empty = [0] + [0 if kind == _SUM else None for kind, _ in slots]
+
+    groups = {}
+    group_slice = None
+    group_slices = [slice(*field_map[x][:2]) for x in keys]
+    if len(keys) == 1:
+        group_slice = group_slices[0]
+
+    for line in lines:
+        if group_slice is not None:
+            key = line[group_slice]
+        elif keys:
+            key = tuple(line[x] for x in group_slices)
+        else:
+            key = None
+        totals = groups.get(key)
+        if totals is None:
+            totals = groups[key] = list(empty)
+        totals[0] += 1
+
+        for start, end, convert, has_default, default, ops in plan:
+            row = line[start:end]
+            if has_default and not row.strip(whitespace):
+                value = default
+            else:
+                value = convert(row)
+            if value is None:
+                continue
+            for kind, slot in ops:
+                current = totals[slot]
+                if kind == _SUM:
+                    totals[slot] = current + value
+                elif current is None or \
+                        (value < current if kind == _MIN else value > current):
+                    totals[slot] = value
+
+    if not keys:
+        return _result(groups.get(None, empty), slots)
+
+    converters = [field_map[x][2:] for x in keys]
+    merged = {}
+    for key, totals in groups.items():
+        raw = (key,) if len(keys) == 1 else key
+        value = tuple(
+            default if has_default and not row.strip(whitespace) else convert(row)
+            for row, (convert, has_default, default) in zip(raw, converters))
+        if len(keys) == 1:
+            value = value[0]
+        if value in merged:
+            totals = _merge(merged[value], totals, slots)
+        merged[value] = totals
+    return dict((key, _result(totals, slots)) for key, totals in merged.items())
+
+
+def _merge(first, second, slots):
+
+    """
+    Returns the running totals of two groups combined.
+    """
+
+    totals = [first[0] + second[0]]
+    for slot, (kind, _) in enumerate(slots, 1):
+        values = [x for x in (first[slot], second[slot]) if x is not None]
+        if kind == _SUM:
+            totals.append(first[slot] + second[slot])
+        elif not values:
+            totals.append(None)
+        else:
+            totals.append(min(values) if kind == _MIN else max(values))
+    return totals
+
+
+def _result(totals, slots):
+
+    """
+    Returns the Aggregate for a list of running totals.
+    """
+
+    result = Aggregate(totals[0], {}, {}, {})
+    for slot, (kind, name) in enumerate(slots, 1):
+        result[kind + 1][name] = totals[slot]
+    return result
@@ -0,0 +1,110 @@
+"""
+Asyncio streaming of fixed-width records (Python 3.6+).
+
+iter_records reads from an asyncio.StreamReader and write_records writes
+to an asyncio.StreamWriter, using the same per-record logic as
+FixedWidth.iter_records and FixedWidth.write_records. Conversion happens
+a chunk at a time and, with offload=True, runs in an executor so that
+large files don't stall other coroutines.
+"""
+import asyncio
+from functools import partial
+
+from .fixedwidth import CHUNK_SIZE, _line_limit, _split_chunk
+
+
+def _parse_lines(parse, lines):
+    return [parse(line) for line in lines]
+
+
+def _render_lines(render, line_end, records):
+    return b''.join([render(record) + line_end for record in records])
+
+
+async def _aiter(iterable):
+    for item in iterable:
+        yield item
+
+
+async def iter_records(fw, reader, fields=None, chunk_size=CHUNK_SIZE,
+                       offload=False, executor=None):
+
+    """
+    Yields a new dict for each record read from the asyncio.StreamReader
+    'reader', whose bytes are in fw.encoding. If 'fields' is given, only
+    those fields are sliced and converted.
+
+    The records in each chunk of 'chunk_size' bytes are parsed together;
+    with 'offload', in 'executor' (default: the loop's default executor).
+    Raises ValueError if no line end is found, like FixedWidth.iter_records.
+    """
+
+    loop = asyncio.get_event_loop()
+    parse_lines = partial(_parse_lines, fw.layout.parser(fields, binary=True))
+    line_end = fw.line_end.encode(fw.encoding)
+    record_length = fw.layout.record_length
+    limit = _line_limit(chunk_size, line_end, record_length)
+
+    remainder = b''
+    while True:
+        chunk = await reader.read(chunk_size)
+        if not chunk:
+            break
+        lines, remainder = _split_chunk(
+            remainder + chunk, line_end, record_length, limit)
+        if offload:
+            records = await loop.run_in_executor(executor, parse_lines, lines)
+        else:
+            records = parse_lines(lines)
+        for record in records:
+            yield record
+
+    if remainder:
+        # the final record has no line end
+        for record in parse_lines([remainder]):
+            yield record
+
+
+async def write_records(fw, records, writer, buffer_size=CHUNK_SIZE,
+                        offload=False, executor=None):
+
+    """
+    Writes a fixed-width line for each dict in 'records', which may be an
+    iterable or an async iterable, to the asyncio.StreamWriter 'writer'
+    in fw.encoding, and returns the number of lines written.
+
+    Records are validated like FixedWidth.write_records and rendered in
+    batches of about 'buffer_size' bytes; with 'offload', in 'executor'
+    (default: the loop's default executor). The writer is drained after
+    each batch.
+    """
+
+    loop = asyncio.get_event_loop()
+    render_lines = partial(_render_lines, fw.layout.render_bytes,
+                           fw.line_end.encode(fw.encoding))
+    record_size = fw.layout.record_length + len(fw.line_end.encode(fw.encoding))
+    batch_size = max(1, buffer_size // record_size)
+
+    async def flush(batch):
+        if offload:
+            block = await loop.run_in_executor(executor, render_lines, batch)
+        else:
+            block = render_lines(batch)
+        writer.write(block)
+        await writer.drain()
+
+    if not hasattr(records, '__aiter__'):
+        records = _aiter(records)
+
+    count = 0
+    batch = []
+    async for record in records:
+        batch.append(record)
+        if len(batch) >= batch_size:
+            await flush(batch)
+            count += len(batch)
+            batch = []
+    if batch:
+        await flush(batch)
+        count += len(batch)
+    return count
@@ -0,0 +1,293 @@
+"""
+The fixedwidth command: converts fixed-width files to and from CSV and
+JSON Lines, using a layout file holding a FixedWidth config as JSON (or
+YAML, if PyYAML is installed), e.g.:
+
+    fixedwidth export layout.json input.txt output.csv --fields name amount
+    fixedwidth import layout.json input.jsonl output.txt --format jsonl
+
+Records are streamed, so memory use does not grow with the file. A
+summary of the records converted and the throughput is printed to
+stderr unless --quiet is given.
+"""
+from __future__ import print_function
+
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+from datetime import datetime
+from decimal import Decimal
+from timeit import default_timer
+
+from .fixedwidth import FixedWidth
+from . import parallel
+
+try:
+    import yaml
+except ImportError:  # pragma: no cover
+    yaml = None
+else:
+    class _DecimalLoader(yaml.SafeLoader):
+        """
+        A safe YAML loader that reads floats as Decimals.
+        """
+
+    def _construct_decimal(loader, node):
+        value = loader.construct_scalar(node)
+        try:
+            return Decimal(value.replace('_', ''))
+        except ArithmeticError:
+            # .inf, .nan and other YAML spellings
+            return loader.construct_yaml_float(node)
+
+    _DecimalLoader.add_constructor(u'tag:yaml.org,2002:float', _construct_decimal)
+
+
+def load_layout(path):
+
+    """
+    Returns the FixedWidth config in the JSON or YAML file at 'path'.
+    YAML files (.yaml or .yml) require PyYAML. Floats are read as
+    Decimals, so decimal defaults keep the digits that were written.
+    """
+
+    with io.open(path, encoding='utf-8') as infile:
+        if os.path.splitext(path)[1].lower() in ('.yaml', '.yml'):
+            if yaml is None:
+                raise ValueError("PyYAML is required to read %s." % (path,))
+            return yaml.load(infile, Loader=_DecimalLoader)
+        return json.load(infile, parse_float=Decimal)
+
+
+def _importers(fw):
+
+    """
+    Returns a dict of field name -> function that converts a CSV or JSON
+    value to the field's type.
+    """
+
+    importers = {}
+    for field_name, parameters in fw.config.items():
+        field_type = parameters['type']
+        if field_type == 'integer':
+            importers[field_name] = int
+        elif field_type in ('decimal', 'packed', 'zoned'):
+            importers[field_name] = lambda value: Decimal(str(value))
+        elif field_type == 'date':
+            importers[field_name] = \
+                lambda value, format=parameters['format']: datetime.strptime(value, format)
+        else:
+            importers[field_name] = str
+    return importers
+
+
+def _exporters(fw):
+
+    """
+    Returns a dict of field name -> function that converts a field value
+    to a CSV or JSON value: dates are formatted with the field's format,
+    and decimals become strings so they stay exact.
+    """
+
+    exporters = {}
+    for field_name, parameters in fw.config.items():
+        if parameters['type'] == 'date':
+            exporters[field_name] = fw.layout.formatters[field_name]
+        elif parameters['type'] in ('decimal', 'packed', 'zoned'):
+            exporters[field_name] = str
+    return exporters
+
+
+def export_records(fw, records, outfile, output_format, fields):
+
+    """
+    Writes 'records' to 'outfile' as CSV (with a header row of 'fields')
+    or JSON Lines, and returns the number written.
+    """
+
+    exporters = _exporters(fw)
+    export = [(x, exporters.get(x)) for x in fields]
+    count = 0
+    if output_format == 'csv':
+        writer = csv.writer(outfile)
+        writer.writerow(fields)
+        for record in records:
+            writer.writerow([
+                '' if record[name] is None else convert(record[name]) if convert
+                else record[name] for name, convert in export])
+            count += 1
+    else:
+        dumps = json.dumps
+        write = outfile.write
+        for record in records:
+            write(dumps(dict(
+                (name, convert(record[name]) if convert and record[name] is not None
+                 else record[name]) for name, convert in export)) + '\n')
+            count += 1
+    return count
+
+
+def import_records(fw, infile, input_format, position=None):
+
+    """
+    Yields a dict for each CSV row (with a header row) or JSON line of
+    'infile', converted to the field types. Empty and null values are left
+    out, so the field's default or config value is used.
+
+    If 'position' is a list, its first item is set to the line number of
+    each row before the row is converted.
+    """
+
+    importers = _importers(fw)
+    if position is None:
+        position = [0]
+    if input_format == 'csv':
+        reader = csv.DictReader(infile)
+        rows = ((reader.line_num, x) for x in reader)
+    else:
+        rows = ((number, x) for number, x in enumerate(infile, 1) if x.strip())
+    for number, row in rows:
+        position[0] = number
+        if input_format != 'csv':
+            row = json.loads(row, parse_float=Decimal)
+        record = {}
+        for name, value in row.items():
+            if value is None or value == '':
+                continue
+            if name not in importers:
+                raise ValueError("Unknown field: %s" % (name,))
+            record[name] = importers[name](value)
+        yield record
+
+
+def _numbered(records, position):
+
+    """
+    Yields the items of 'records', setting the first item of the list
+    'position' to the number of items yielded so far.
+    """
+
+    for number, record in enumerate(records, 1):
+        position[0] = number
+        yield record
+
+
+def _open(path, mode):
+
+    """
+    Opens 'path' for reading or writing ('r', 'w', 'rb' or 'wb'); '-' is
+    standard input or output.
+    """
+
+    if path == '-':
+        stream = sys.stdin if 'r' in mode else sys.stdout
+        if 'b' in mode:
+            return getattr(stream, 'buffer', stream)
+        return stream
+    if 'b' in mode:
+        return open(path, mode)
+    return io.open(path, mode, encoding='utf-8', newline='')
+
+
+def _close(stream):
+
+    """
+    Closes a file opened by _open, or flushes standard output.
+    """
+
+    if stream in (sys.stdout, getattr(sys.stdout, 'buffer', None)):
+        stream.flush()
+    elif stream not in (sys.stdin, getattr(sys.stdin, 'buffer', None)):
+        stream.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='fixedwidth', description=__doc__.strip().splitlines()[0])
+    parser.add_argument('command', choices=['export', 'import'],
+                        help='export fixed-width to CSV/JSONL, or import into fixed-width')
+    parser.add_argument('layout', help='JSON or YAML file holding the FixedWidth config')
+    parser.add_argument('input', nargs='?', default='-', help='input file (default: stdin)')
+    parser.add_argument('output', nargs='?', default='-', help='output file (default: stdout)')
+    parser.add_argument('--format', choices=['csv', 'jsonl'], default='csv',
+                        help='CSV or JSON Lines format of the other file (default: csv)')
+    parser.add_argument('--fields', nargs='+', help='export only these fields, in this order')
+    parser.add_argument('--workers', type=int,
+                        help='export with this many worker processes (requires an input file)')
+    parser.add_argument('--line-end', help='line end of fixed-width records (default: CRLF)')
+    parser.add_argument('--encoding', help='encoding of fixed-width files (default: utf-8)')
+    parser.add_argument('--fixed-point', action='store_true',
+                        help='decimals have an implied decimal point')
+    parser.add_argument('--quiet', action='store_true', help='do not print a summary')
+    args = parser.parse_args(argv)
+
+    if args.command == 'import' and (args.fields or args.workers):
+        parser.error("--fields and --workers only apply to export")
+    if args.workers and args.input == '-':
+        parser.error("--workers requires an input file")
+
+    options = {'fixed_point': args.fixed_point}
+    if args.line_end is not None:
+        options['line_end'] = args.line_end.encode('ascii').decode('unicode_escape')
+    if args.encoding:
+        options['encoding'] = args.encoding
+    try:
+        fw = FixedWidth(load_layout(args.layout), **options)
+        fields = args.fields or list(fw.layout.names)
+        # fail early on unknown field names
+        fw.layout.projection(fields)
+    except (ValueError, IOError) as error:
+        parser.error(str(error))
+
+    start = default_timer()
+    position = [0]
+    if args.command == 'export':
+        infile = None
+        try:
+            if args.workers:
+                records = parallel.iter_records(fw, args.input, fields, args.workers)
+            else:
+                infile = _open(args.input, 'rb')
+                records = fw.iter_records(infile, fields)
+        except (ValueError, IOError) as error:
+            parser.error(str(error))
+        outfile = _open(args.output, 'w')
+        try:
+            count = export_records(fw, _numbered(records, position), outfile,
+                                   args.format, fields)
+        except (ValueError, ArithmeticError) as error:
+            # the record after the last one exported could not be read
+            parser.exit(1, "%s: error: %s line %d: %s\n" % (
+                parser.prog, args.input, position[0] + 1, error))
+        finally:
+            for stream in (infile, outfile):
+                if stream is not None:
+                    _close(stream)
+    else:
+        infile = _open(args.input, 'r')
+        outfile = _open(args.output, 'wb')
+        try:
+            count = fw.write_records(
+                import_records(fw, infile, args.format, position), outfile)
+        except (ValueError, ArithmeticError) as error:
+            parser.exit(1, "%s: error: %s line %d: %s\n" % (
+                parser.prog, args.input, position[0], error))
+        finally:
+            _close(infile)
+            _close(outfile)
+    seconds = default_timer() - start
+
+    if not args.quiet:
+        size = count * (fw.layout.record_length + len(fw.line_end.encode(fw.encoding)))
+        seconds = max(seconds, 1e-9)
+        print("%sed %d records in %.3f seconds (%.0f records/sec, %.0f bytes/sec)."
+              % (args.command.capitalize(), count, seconds, count / seconds,
+                 size / seconds), file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
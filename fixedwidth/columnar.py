@@ -0,0 +1,133 @@
+"""
+Columnar decoding of fixed-width data into NumPy arrays.
+
+Requires numpy, which is an optional dependency:
+
+    pip install FixedWidth[numpy]
+"""
+from collections import OrderedDict
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def record_dtype(fw, fields=None):
+
+    """
+    Returns a NumPy structured dtype with an 'S<length>' field at the
+    offset of each field in 'fields' (default: all fields), spanning one
+    whole record including its line end.
+    """
+
+    if numpy is None:
+        raise ImportError("fixedwidth.columnar requires numpy")
+
+    plan = fw.layout.projection(fields) if fields is not None else fw.layout.parse_plan
+    return numpy.dtype({
+        'names': [x[0] for x in plan],
+        'formats': ['S%d' % (x[2] - x[1]) for x in plan],
+        'offsets': [x[1] for x in plan],
+        'itemsize': fw.layout.record_length + len(fw.line_end.encode(fw.encoding)),
+    })
+
+
+def decode_columns(fw, source, fields=None):
+
+    """
+    Decodes every record in 'source' at once and returns an OrderedDict
+    mapping each field name in 'fields' (default: all fields) to a NumPy
+    array of its values.
+
+    'source' may be a bytes-like object, a file object opened in binary
+    mode or a path. Its encoding must use one byte per character.
+
+    Column types:
+        string, numeric   unicode arrays, stripped
+        integer           int64, or float64 with NaN if a blank field
+                          has a default of None
+        decimal           float64; blank fields use the default or NaN,
+                          fixed-point fields are scaled by their precision
+        date              datetime64[us]; each distinct value is parsed
+                          once, and blank fields use the default or NaT
+        packed, zoned     float64; each distinct value is converted once
+
+    Integers and decimals are converted vectorized if the encoding is
+    ASCII-compatible, and like dates otherwise.
+    """
+
+    dtype = record_dtype(fw, fields)
+
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        data = source
+    elif hasattr(source, 'read'):
+        data = source.read()
+    else:
+        with open(source, 'rb') as infile:
+            data = infile.read()
+
+    remainder = len(data) % dtype.itemsize
+    if remainder == fw.layout.record_length:
+        # the final record has no line end
+        data = bytes(data) + fw.line_end.encode(fw.encoding)
+    elif remainder:
+        raise ValueError("%d bytes is not a whole number of %d byte \
+            records." % (len(data), dtype.itemsize))
+    records = numpy.frombuffer(data, dtype=dtype)
+
+    layout = fw.layout
+    plan = layout.projection(fields, True) if fields is not None else layout.bytes_plan
+    columns = OrderedDict()
+    for field_name, start, end, convert, has_default, default in plan:
+        parameters = fw.config[field_name]
+        column = records[field_name]
+        field_type = parameters['type']
+
+        if field_type in ('string', 'numeric'):
+            column = numpy.char.strip(numpy.char.decode(column, fw.encoding))
+        elif field_type in ('integer', 'decimal') and layout.whitespace is None:
+            column = _convert_numbers(column, field_type, has_default, default)
+            if field_type == 'decimal' and fw.fixed_point and 'precision' in parameters:
+                # implied decimal point
+                column /= 10 ** parameters['precision']
+        else:
+            # batch files repeat the same few values, so convert each once
+            values, inverse = numpy.unique(column, return_inverse=True)
+            values = [
+                default if has_default and not x.strip(layout.whitespace) else convert(x)
+                for x in values
+            ]
+            if field_type == 'date':
+                column = numpy.array(values, dtype='datetime64[us]')[inverse]
+            elif field_type == 'integer' and None not in values:
+                column = numpy.array(values, dtype=numpy.int64)[inverse]
+            else:
+                column = numpy.array(values, dtype=numpy.float64)[inverse]
+        columns[field_name] = column
+    return columns
+
+
+def _convert_numbers(column, field_type, has_default, default):
+
+    """
+    Converts the ASCII 'S<length>' array 'column' to int64 or float64.
+    """
+
+    blank = numpy.char.strip(column) == b''
+    if not has_default or not blank.any():
+        if field_type == 'integer':
+            return column.astype(numpy.int64)
+        return column.astype(numpy.float64)
+
+    filled = numpy.where(blank, b'0', column)
+    if default is None:
+        result = filled.astype(numpy.float64)
+        result[blank] = numpy.nan
+    elif field_type == 'integer':
+        result = filled.astype(numpy.int64)
+        result[blank] = default
+    else:
+        result = filled.astype(numpy.float64)
+        result[blank] = float(default)
+    return result
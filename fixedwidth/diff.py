@@ -0,0 +1,91 @@
+"""
+Record-level differences between two fixed-width files of one layout.
+"""
+from collections import namedtuple
+
+from .fixedwidth import CHUNK_SIZE
+from .sort import RUN_RECORDS, _close_runs, _sorted_lines
+
+DiffEntry = namedtuple('DiffEntry', ['kind', 'key', 'old', 'new', 'changes'])
+
+
+def diff(fw, old, new, keys, run_records=RUN_RECORDS, chunk_size=CHUNK_SIZE):
+
+    """
+    Yields a DiffEntry (kind, key, old, new, changes) for each record
+    that was 'added' to, 'removed' from or 'changed' between the files
+    'old' and 'new', which are read like FixedWidth.iter_records, in
+    order of their raw key slices.
+
+    Records are matched on the fields named in 'keys'; key is the
+    converted key value (a tuple if there are several key fields).
+    Unchanged records are found by comparing raw lines, so only the
+    records reported are converted: old and new are their dicts (None
+    for the missing side), and for changed records changes is a dict of
+    field name -> (old value, new value) for the fields that differ.
+
+    Keys are compared as raw text or bytes, so key fields should have
+    the same padding in both files. Each file is sorted in runs of
+    'run_records' records, spilled to temporary files when a file has
+    more than one run, so memory use does not grow with the files.
+    """
+
+    layout = fw.layout
+    # fail early on unknown field names
+    layout.projection(keys)
+    record_length = layout.record_length
+    runs = []
+    try:
+        old_lines, binary = fw._read_lines(old, chunk_size)
+        new_lines, new_binary = fw._read_lines(new, chunk_size)
+        if binary != new_binary:
+            raise ValueError("Both files must be opened in text mode, or both in \
+                binary mode.")
+        old_records = _sorted_lines(fw, old_lines, binary, keys, False, False, runs,
+                                    run_records, chunk_size)
+        new_records = _sorted_lines(fw, new_lines, binary, keys, False, False, runs,
+                                    run_records, chunk_size)
+
+        parse = layout.parser(None, binary)
+        key_parse = layout.parser(keys, binary)
+        field_map = layout.field_map(None, binary)
+        slices = [(name,) + field_map[name][:2] for name in layout.names]
+
+        def key_value(line):
+            values = key_parse(line)
+            if len(keys) == 1:
+                return values[keys[0]]
+            return tuple(values[x] for x in keys)
+
+        old_record = next(old_records, None)
+        new_record = next(new_records, None)
+        while old_record is not None or new_record is not None:
+            if new_record is None or \
+                    (old_record is not None and old_record[0] < new_record[0]):
+                line = old_record[1]
+                yield DiffEntry('removed', key_value(line), parse(line), None, None)
+                old_record = next(old_records, None)
+
+            elif old_record is None or new_record[0] < old_record[0]:
+                line = new_record[1]
+                yield DiffEntry('added', key_value(line), None, parse(line), None)
+                new_record = next(new_records, None)
+
+            else:
+                old_line = old_record[1]
+                new_line = new_record[1]
+                if old_line[:record_length] != new_line[:record_length]:
+                    old_data = parse(old_line)
+                    new_data = parse(new_line)
+                    changes = dict(
+                        (name, (old_data[name], new_data[name]))
+                        for name, start, end in slices
+                        if old_line[start:end] != new_line[start:end]
+                        and old_data[name] != new_data[name])
+                    if changes:
+                        yield DiffEntry('changed', key_value(new_line), old_data,
+                                        new_data, changes)
+                old_record = next(old_records, None)
+                new_record = next(new_records, None)
+    finally:
+        _close_runs(runs)
@@ -1,10 +1,42 @@
 """
 The FixedWidth class definition.
 """
+import hashlib
+import io
+import pickle
+from binascii import hexlify, unhexlify
 from decimal import Decimal, ROUND_HALF_EVEN
+from functools import partial
+from operator import methodcaller
+from timeit import default_timer
 
+from collections import namedtuple
+from copy import deepcopy
 from datetime import datetime
-from six import string_types, integer_types
+from six import string_types, integer_types, text_type
+
+#imported up front, as strptime's lazy import is not thread-safe on Python 2
+import _strptime  # noqa: F401
+
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+
+#default number of characters (or bytes) read from a file at a time
+CHUNK_SIZE = 1024 * 1024
+
+#number of records' worth of characters read without a line end before a
+#file is taken to have none (see _line_limit)
+LINE_LIMIT_RECORDS = 16
+
+#FixedWidth options and their defaults
+OPTIONS = {
+    'line_end': '\r\n',
+    'fixed_point': False,
+    'encoding': 'utf-8',
+    'date_cache_size': 0,
+}
 
 
 class FixedWidth(object):
@@ -26,7 +58,8 @@ class FixedWidth(object):
     The following keys are only used when emitting fixed-width strings:
         alignment   a string; required
         padding     a string; required
-        precision   an integer, to format decimals numbers
+        precision   an integer, to format decimals numbers; the number of
+                    implied decimal places of packed and zoned fields
         rounding    a constant ROUND_xxx used when precision is set
 
     Notes:
@@ -35,18 +68,45 @@ class FixedWidth(object):
 
         A field may not have a default value if it is required.
 
-        Type may be string, integer, decimal, numeric, or date.
+        Type may be string, integer, decimal, numeric, date, packed
+        (COBOL COMP-3 packed decimal, 'length' is in bytes) or zoned
+        (signed zoned decimal, with the sign overpunched on the last
+        digit). Packed and zoned fields are parsed as Decimals.
 
         Alignment and padding are required.
 
+    Thread safety:
+        self.data, and so the line property, validate() and update(), are
+        per-object state. parse(), build() and the methods that read and
+        write whole files (iter_records, write_records, validate_records,
+        validate_file) use only the shared, read-only Schema and Layout,
+        so one object can serve any number of threads at once. Building a
+        FixedWidth from an already-seen config is cheap, as its Schema is
+        cached. Stats counts kept by instrument() are not locked, so they
+        may undercount when several threads use one instrumented object.
+
     """
 
     def __init__(self, config, **kwargs):
 
         """
         Arguments:
-            config: required, dict defining fixed-width format
+            config: required, dict defining fixed-width format, or a Schema
             kwargs: optional, dict of values for the FixedWidth object
+
+        The config is validated and compiled once into a cached Schema
+        (see Schema.get); it is copied, not modified. self.config is a
+        read-only view of the validated copy, which is shared.
+
+        The following kwargs are options rather than values (they can not
+        be given with a Schema, which has its own):
+            line_end: a string; terminates each line, default CRLF
+            fixed_point: a boolean; omit the decimal point from decimals,
+                and parse decimals with a precision as implied decimals
+            encoding: a string; codec for bytes lines and files opened in
+                binary mode, whose positions are byte offsets
+            date_cache_size: an integer; number of distinct date strings
+                per field to memoize when parsing, default 0 (off)
         """
 
         self.format_functions = {
@@ -57,20 +117,302 @@ class FixedWidth(object):
             'date': self._get_date_data,
         }
 
-        self.line_end = kwargs.pop('line_end', '\r\n')
-        self.fixed_point = kwargs.pop('fixed_point', False)
-        self.config = config
+        options = dict((x, kwargs.pop(x)) for x in OPTIONS if x in kwargs)
 
         self.data = {}
         if kwargs:
             self.data = kwargs
 
-        self.ordered_fields = sorted(
-            [(self.config[x]['start_pos'], x) for x in self.config]
+        self.schema = config
+        if not isinstance(config, Schema):
+            self.schema = Schema.get(config, **options)
+        elif options:
+            raise ValueError("Options can not be given with a Schema.")
+
+        self.config = self.schema.config
+        self.ordered_fields = self.schema.ordered_fields
+        self.layout = self.schema.layout
+        for name, value in self.schema.options.items():
+            setattr(self, name, value)
+
+    def update(self, **kwargs):
+
+        """
+        Update self.data using the kwargs sent.
+        """
+
+        self.data.update(kwargs)
+
+    def validate(self):
+
+        """
+        Ensure the data in self.data is consistent with self.config
+        """
+
+        self.layout.validate(self.data, fill=self.data)
+
+        return True
+
+    def instrument(self, stats=None):
+
+        """
+        Starts timing every field conversion and every line parsed or
+        emitted by this object, and returns the Stats they are added to
+        (a new one unless 'stats' is given). Call uninstrument() to stop.
+
+        Only this object is affected; objects sharing its Schema, and
+        the worker processes of fixedwidth.parallel, are not timed.
+        """
+
+        if stats is None:
+            stats = Stats()
+        self.layout = self.schema.layout.instrumented(stats)
+        return stats
+
+    def uninstrument(self):
+
+        """
+        Stops timing started by instrument().
+        """
+
+        self.layout = self.schema.layout
+
+    def _get_decimal_data(self, field_name):
+        """
+        quantizes field if it is decimal type and precision is set
+        """
+        return self.layout.formatters[field_name](self.data[field_name])
+
+    def _get_date_data(self, field_name):
+        return self.layout.formatters[field_name](self.data[field_name])
+
+    def _format_field(self, field_name):
+        """
+        Converts field data and returns it as a string.
+        """
+        data = self.data[field_name]
+        if data is None:
+            # Empty fields can not be formatted
+            return ''
+        return self.layout.formatters[field_name](data)
+
+    def _build_line(self):
+
+        """
+        Returns a fixed-width line made up of self.data, using
+        self.config.
+        """
+
+        return self.layout.render(self.data, fill=self.data) + self.line_end
+
+    is_valid = property(validate)
+
+    def parse(self, line, fields=None):
+
+        """
+        Returns a new dict of the fields in the fixed-width text or bytes
+        'line', like setting self.line, but without touching self.data.
+        If 'fields' is given, only those fields are sliced and converted.
+        Safe to call from several threads at once.
+        """
+
+        return self.layout.parse(line, fields)
+
+    def build(self, data):
+
+        """
+        Validates the dict 'data' and returns its fixed-width line, with
+        self.line_end, like reading self.line, but without touching
+        self.data or 'data' (defaults are used but not written back).
+        Safe to call from several threads at once.
+        """
+
+        return self.layout.render(data) + self.line_end
+
+    def _string_to_dict(self, fw_string):
+
+        """
+        Take a fixed-width string and use it to
+        populate self.data, based on self.config.
+        """
+
+        self.data = self.layout.parse(fw_string)
+
+        return self.data
+
+    line = property(_build_line, _string_to_dict)
+
+    def iter_records(self, fileobj, fields=None, chunk_size=CHUNK_SIZE, lazy=False):
+
+        """
+        Yields a new dict for each record in 'fileobj', reading it in
+        chunks of 'chunk_size' so memory use does not grow with the file.
+        If 'fields' is given, only those fields are sliced and converted.
+        If 'lazy', yields a Record for each line instead, which converts
+        fields only when they are read.
+
+        'fileobj' may be opened in text mode (use newline='' so that line
+        ends are not translated) or in binary mode, in which case fields
+        are sliced from the bytes and decoded one at a time using
+        self.encoding. If self.line_end is empty, records are split on
+        the fixed record length instead.
+
+        self.data is not modified.
+        """
+
+        lines, binary = self._read_lines(fileobj, chunk_size)
+        if lazy:
+            parse = partial(Record, self.layout, fields=fields)
+        else:
+            parse = self.layout.parser(fields, binary)
+        for line in lines:
+            yield parse(line)
+
+    def write_records(self, records, fileobj, buffer_size=CHUNK_SIZE, fields=None):
+
+        """
+        Writes a fixed-width line for each dict in 'records' to 'fileobj'
+        and returns the number of lines written.
+
+        Each record is validated like self.validate(), but neither the
+        records nor self.data are modified. Unchanged Record views are
+        copied from their original line instead. Lines are joined and
+        written in blocks of about 'buffer_size' characters. If 'fileobj'
+        is opened in binary mode, lines are encoded using self.encoding.
+
+        If 'fields' is given, only those fields are taken from each record;
+        every other field is always written from its config value or
+        default, which are formatted just once (see Layout.templated), and
+        ValueError is raised if a record has a different value for one.
+        """
+
+        render = self.layout.render
+        line_end = self.line_end
+        join = ''.join
+        write = fileobj.write
+        binary = False
+        if isinstance(fileobj, (io.RawIOBase, io.BufferedIOBase)) \
+                or 'b' in getattr(fileobj, 'mode', ''):
+            render = self.layout.render_bytes
+            line_end = line_end.encode(self.encoding)
+            join = b''.join
+            binary = True
+        if fields is not None:
+            render = self.layout.templated(fields, binary)
+
+        count = 0
+        size = 0
+        lines = []
+        for record in records:
+            if record.__class__ is Record and record.layout is self.layout:
+                line = record.render(binary) + line_end
+            else:
+                line = render(record) + line_end
+            lines.append(line)
+            size += len(line)
+            if size >= buffer_size:
+                write(join(lines))
+                count += len(lines)
+                size = 0
+                lines = []
+        if lines:
+            write(join(lines))
+            count += len(lines)
+        return count
+
+    def validate_records(self, records, max_errors=None):
+
+        """
+        Validates each dict in 'records' like self.validate(), without
+        modifying them or self.data, and returns a list of FieldError
+        (line, field, reason) tuples for every invalid field. Lines are
+        numbered from 1. Stops after 'max_errors' errors, if given.
+        """
+
+        validate = self.layout.validate
+        report = []
+        errors = []
+        for number, record in enumerate(records, 1):
+            validate(record, errors=errors)
+            if errors:
+                report.extend(FieldError(number, field, reason) for field, reason in errors)
+                errors = []
+                if max_errors is not None and len(report) >= max_errors:
+                    return report[:max_errors]
+        return report
+
+    def validate_file(self, fileobj, max_errors=None, chunk_size=CHUNK_SIZE):
+
+        """
+        Checks each line of 'fileobj' (see iter_records) and returns a
+        list of FieldError (line, field, reason) tuples for lines of the
+        wrong length, blank required fields, hard-coded values that
+        differ and fields that can not be converted. Lines are numbered
+        from 1. Stops after 'max_errors' errors, if given.
+        """
+
+        lines, binary = self._read_lines(fileobj, chunk_size)
+        check = self.layout.checker(binary)
+        report = []
+        for number, line in enumerate(lines, 1):
+            errors = check(line)
+            if errors:
+                report.extend(FieldError(number, field, reason) for field, reason in errors)
+                if max_errors is not None and len(report) >= max_errors:
+                    return report[:max_errors]
+        return report
+
+    def _read_lines(self, fileobj, chunk_size=CHUNK_SIZE, max_length=None):
+
+        """
+        Returns an iterator over the records in 'fileobj', without line
+        ends, and whether they are bytes rather than text. Lines may be
+        up to 'max_length' (default: the record length) long.
+        """
+
+        read = fileobj.read
+        chunk = read(chunk_size)
+        line_end = self.line_end
+        binary = not isinstance(chunk, text_type)
+        if binary:
+            line_end = line_end.encode(self.encoding)
+        lines = _split_records(read, chunk, chunk_size, line_end,
+                               self.layout.record_length, max_length)
+        return lines, binary
+
+
+class Schema(object):
+    """
+    A validated FixedWidth config, its options and its compiled Layout.
+
+    Schemas are immutable and hashable, and Schema.get caches them by the
+    content of the config and options, so that FixedWidth objects built
+    from equal configs share one and skip validation. A Schema can be
+    saved to a file and loaded without validating it again.
+
+    self.config is a read-only view of the validated config: a mapping of
+    field name -> read-only mapping of its parameters.
+    """
+
+    #content key -> Schema
+    _cache = {}
+
+    def __init__(self, config, **options):
+
+        """
+        Arguments:
+            config: required, dict defining fixed-width format; not modified
+            options: optional, the FixedWidth options (see OPTIONS)
+        """
+
+        config = deepcopy(config)
+
+        ordered_fields = sorted(
+            [(config[x]['start_pos'], x) for x in config]
         )
 
         #Raise exception for bad config
-        for key, value in self.config.items():
+        for key, value in config.items():
 
             #required values
             if any([x not in value for x in (
@@ -87,7 +429,7 @@ class FixedWidth(object):
                 else:
                     raise ValueError("No format string provided for field %s" % (key,))
 
-            elif value['type'] == 'decimal':
+            elif value['type'] in ('decimal', 'packed', 'zoned'):
                 if 'precision' in value and type(value['precision']) != int:
                     raise ValueError("Precision parameter for field %s must be an int" % (key,))
 
@@ -112,9 +454,10 @@ class FixedWidth(object):
                 raise ValueError("%s end_pos must be *after* start_pos." % (key,))
 
             #make sure authorized type was provided
-            if not value['type'] in ('string', 'integer', 'decimal', 'numeric', 'date'):
+            if not value['type'] in TYPE_TESTS:
                 raise ValueError("Field %s has an invalid type (%s). Allowed: 'string', \
-                    'integer', 'decimal', 'numeric', 'date" % (key, value['type']))
+                    'integer', 'decimal', 'numeric', 'date', 'packed', 'zoned'" \
+                    % (key, value['type']))
 
             #make sure alignment is 'left' or 'right'
             if not value['alignment'] in ('left', 'right'):
@@ -131,20 +474,22 @@ class FixedWidth(object):
                         can not have a default value" % (key,))
 
                 #ensure default value provided matches type
-                if value['type'] == 'decimal' and value['default'] is not None:
+                if value['type'] in ('decimal', 'packed', 'zoned') \
+                        and value['default'] is not None:
                     value['default'] = Decimal(value['default'])
                 elif value['type'] == 'date' and isinstance(value['default'], string_types):
                     value['default'] = datetime.strptime(value['default'], value['format'])
 
                 types = {'string': string_types, 'integer': int, 'decimal': Decimal,
-                         'numeric': str, 'date': datetime}
+                         'numeric': str, 'date': datetime, 'packed': Decimal,
+                         'zoned': Decimal}
                 if value['default'] is not None and not isinstance(value['default'], types[value['type']]):
                     raise ValueError("Default value for %s is not a valid %s" \
                         % (key, value['type']))
 
             #if a precision was provided, make sure
             #it doesn't violate rules
-            if value['type'] == 'decimal' and 'precision' in value:
+            if value['type'] in ('decimal', 'packed', 'zoned') and 'precision' in value:
 
                 #make sure authorized type was provided
                 if not isinstance(value['precision'], int):
@@ -155,7 +500,7 @@ class FixedWidth(object):
 
         #ensure start_pos and end_pos or length is correct in config
         current_pos = 1
-        for start_pos, field_name in self.ordered_fields:
+        for start_pos, field_name in ordered_fields:
 
             if start_pos != current_pos:
                 raise ValueError("Field %s starts at position %d; \
@@ -164,164 +509,1275 @@ class FixedWidth(object):
 
             current_pos = current_pos + config[field_name]['length']
 
-    def update(self, **kwargs):
+        self._setup(config, ordered_fields, options)
+
+    def _setup(self, config, ordered_fields, options):
+        unknown = set(options).difference(OPTIONS)
+        if unknown:
+            raise TypeError("Unknown option(s): %s" % (', '.join(sorted(unknown)),))
+        options = dict(OPTIONS, **options)
+
+        setattr_ = partial(object.__setattr__, self)
+        setattr_('_config', config)
+        setattr_('config', _FrozenDict(
+            (name, _FrozenDict(parameters)) for name, parameters in config.items()))
+        setattr_('ordered_fields', tuple(ordered_fields))
+        setattr_('options', options)
+        setattr_('key', _content_key(config, options))
+        setattr_('layout', Layout(config, ordered_fields, options['fixed_point'],
+                             options['date_cache_size'], options['encoding']))
+
+    @classmethod
+    def get(cls, config, **options):
 
         """
-        Update self.data using the kwargs sent.
+        Returns the cached Schema for 'config' and 'options', validating
+        and compiling it only the first time an equal config is seen.
+
+        Schemas are cached by the content of both the config given and the
+        validated config, so an equal Schema already loaded with
+        Schema.load is returned instead of the new one.
         """
 
-        self.data.update(kwargs)
+        key = _content_key(config, options)
+        schema = cls._cache.get(key)
+        if schema is None:
+            schema = cls(config, **options)
+            schema = cls._cache[key] = cls._cache.setdefault(schema.key, schema)
+        return schema
 
-    def validate(self):
+    @classmethod
+    def load(cls, path):
 
         """
-        Ensure the data in self.data is consistent with self.config
+        Returns the Schema saved to 'path' by Schema.save. Only load files
+        from a trusted source: they are unpickled.
+
+        The loaded Schema is cached, so Schema.get (and so FixedWidth)
+        returns it for an equal config once that config has been validated.
         """
 
-        type_tests = {
-            'string': lambda x: isinstance(x, string_types),
-            'decimal': lambda x: isinstance(x, Decimal),
-            'integer': lambda x: isinstance(x, integer_types),
-            'numeric': lambda x: str(x).isdigit(),
-            'date': lambda x: isinstance(x, datetime),
-        }
+        with open(path, 'rb') as infile:
+            schema = pickle.load(infile)
+        if not isinstance(schema, cls):
+            raise ValueError("%s does not contain a Schema." % (path,))
+        return cls._cache.setdefault(schema.key, schema)
+
+    def save(self, path):
+
+        """
+        Saves the validated config and options to 'path'.
+        """
+
+        with open(path, 'wb') as outfile:
+            pickle.dump(self, outfile, pickle.HIGHEST_PROTOCOL)
+
+    def __reduce__(self):
+        return (_restore_schema, (self._config, self.ordered_fields, self.options))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Schema objects are immutable.")
+
+    def __hash__(self):
+        return hash(self.key)
+
+    def __eq__(self, other):
+        return isinstance(other, Schema) and self.key == other.key
+
+    def __ne__(self, other):
+        return not self == other
+
+
+class _FrozenDict(Mapping):
+    """
+    A read-only dict.
+    """
+
+    __slots__ = ('_data',)
+
+    def __init__(self, items):
+        self._data = dict(items)
+
+    def __getitem__(self, key):
+        return self._data[key]
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __repr__(self):
+        return repr(self._data)
+
+
+def _restore_schema(config, ordered_fields, options):
+
+    """
+    Rebuilds a pickled Schema without validating its config again.
+    """
+
+    schema = Schema.__new__(Schema)
+    schema._setup(config, ordered_fields, options)
+    return schema
+
+
+def _content_key(config, options):
+
+    """
+    Returns a hash of the content of a config and its options.
+    """
+
+    content = repr((
+        sorted((name, sorted(parameters.items())) for name, parameters in config.items()),
+        sorted(options.items()),
+    ))
+    return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+
+FieldError = namedtuple('FieldError', ['line', 'field', 'reason'])
+
+
+def _count_records(size, record_length, record_size):
+
+    """
+    Returns the number of records of 'record_size' bytes (including the
+    line end) in 'size' bytes. The last record may lack its line end.
+    Raises ValueError if 'size' is not a whole number of records.
+    """
+
+    records, remainder = divmod(size, record_size)
+    if remainder == record_length:
+        # the final record has no line end
+        records += 1
+    elif remainder:
+        raise ValueError("%d bytes is not a whole number of %d byte \
+            records." % (size, record_size))
+    return records
+
+
+def _split_chunk(chunk, line_end, record_length, limit=None):
+
+    """
+    Returns the complete records in 'chunk', split on 'line_end' or, if
+    it is empty, every 'record_length' characters, and the remainder.
+
+    Raises ValueError if the remainder is longer than 'limit' (see
+    _line_limit), which usually means a text file was opened without
+    newline='' and its line ends were translated.
+    """
+
+    if line_end:
+        lines = chunk.split(line_end)
+        remainder = lines.pop()
+        if limit is not None and len(remainder) > limit:
+            raise ValueError("No line end %r found in %d characters; open text \
+                files with newline='' so that line ends are not translated." \
+                % (line_end, len(remainder)))
+        return lines, remainder
+    end = len(chunk) - len(chunk) % record_length
+    return [chunk[pos:pos + record_length] for pos in range(0, end, record_length)], chunk[end:]
+
+
+def _line_limit(chunk_size, line_end, max_length):
+
+    """
+    Returns the number of characters that may be buffered without a line
+    end: a whole chunk, or LINE_LIMIT_RECORDS records of 'max_length' if
+    that is more, so that lines somewhat longer than their layout (such
+    as ones with trailing filler) are still read.
+    """
+
+    return max(chunk_size, LINE_LIMIT_RECORDS * (max_length + len(line_end)))
+
+
+def _split_records(read, chunk, chunk_size, line_end, record_length,
+                   max_length=None):
+
+    """
+    Yields the records from the file read by 'read', starting with the
+    already read 'chunk'. Records are split on 'line_end' or, if it is
+    empty, every 'record_length' characters. A final record without a
+    line end is still yielded.
+
+    Raises ValueError if more than _line_limit characters (for records of
+    'max_length', default: record_length) are read without a line end.
+    """
+
+    limit = _line_limit(chunk_size, line_end, max_length or record_length)
+    remainder = chunk[:0]
+    while chunk:
+        if remainder:
+            chunk = remainder + chunk
+        lines, remainder = _split_chunk(chunk, line_end, record_length, limit)
+        for line in lines:
+            yield line
+        chunk = read(chunk_size)
+    if remainder:
+        yield remainder
+
+
+TYPE_TESTS = {
+    'string': lambda x: isinstance(x, string_types),
+    'decimal': lambda x: isinstance(x, Decimal),
+    'integer': lambda x: isinstance(x, integer_types),
+    'numeric': lambda x: str(x).isdigit(),
+    'date': lambda x: isinstance(x, datetime),
+    'packed': lambda x: isinstance(x, (Decimal,) + integer_types),
+    'zoned': lambda x: isinstance(x, (Decimal,) + integer_types),
+}
+
+
+def _parse_string(text):
+    return text.strip()
+
+
+def _parse_implied_decimal(scale, text):
+    # fixed-point fields have no decimal point; multiplying by
+    # 10 ** -precision puts it back exactly
+    return Decimal(text) * scale
+
+
+def _format_decimal(exponent, rounding, fixed_point, value):
+    if value.__class__ is not Decimal:
+        value = Decimal(str(value))
+    if exponent is not None:
+        value = value.quantize(exponent, rounding)
+    text = str(value)
+    if 'E' in text:
+        # very small or large values use scientific notation
+        text = format(value, 'f')
+    if fixed_point:
+        text = text.replace('.', '')
+    return text
+
+
+#strftime directives that always produce a fixed number of digits,
+#with their index in datetime's arguments and their width
+_DATE_DIRECTIVES = {
+    'Y': (0, 4),
+    'y': (0, 2),
+    'm': (1, 2),
+    'd': (2, 2),
+    'H': (3, 2),
+    'M': (4, 2),
+    'S': (5, 2),
+}
+
+
+def _compile_date_format(date_format):
+
+    """
+    Returns (slices, literals, length) for a date format made up only of
+    fixed-width numeric directives and literal characters, or None.
+
+    slices is a list of (directive, argument index, start, end) and
+    literals a list of (position, character).
+    """
+
+    slices = []
+    literals = []
+    pos = 0
+    chars = iter(date_format)
+    for char in chars:
+        if char == '%':
+            directive = next(chars, None)
+            if directive == '%':
+                literals.append((pos, '%'))
+                pos += 1
+            elif directive in _DATE_DIRECTIVES:
+                index, width = _DATE_DIRECTIVES[directive]
+                if index in [x[1] for x in slices]:
+                    return None
+                slices.append((directive, index, pos, pos + width))
+                pos += width
+            else:
+                return None
+        else:
+            literals.append((pos, char))
+            pos += 1
+    return slices, literals, pos
+
+
+class _DateParser(object):
+    """
+    Converts strings to datetimes using one date format.
+
+    Formats made up of fixed-width numeric directives (such as %Y%m%d or
+    %m/%d/%y) are parsed by slicing; anything else, including strings that
+    don't match the format's width, falls back to datetime.strptime.
+    Up to 'cache_size' distinct strings are memoized.
+    """
+
+    def __init__(self, date_format, cache_size=0):
+        self.date_format = date_format
+        self.cache_size = cache_size
+        self.cache = {}
+        self.compiled = _compile_date_format(date_format)
+
+    def __call__(self, text):
+        if not self.cache_size:
+            return self.parse(text)
+        value = self.cache.get(text)
+        if value is None:
+            if len(self.cache) >= self.cache_size:
+                self.cache.clear()
+            value = self.cache[text] = self.parse(text)
+        return value
+
+    def parse(self, text):
+        if self.compiled is None:
+            return datetime.strptime(text, self.date_format)
+        slices, literals, length = self.compiled
+        if len(text) != length or not all(text[x] == y for x, y in literals):
+            return datetime.strptime(text, self.date_format)
+
+        values = [1900, 1, 1, 0, 0, 0]
+        for directive, index, start, end in slices:
+            digits = text[start:end]
+            if not digits.isdigit():
+                return datetime.strptime(text, self.date_format)
+            values[index] = int(digits)
+            if directive == 'y':
+                # same pivot as strptime: 69-99 -> 1969-1999, 00-68 -> 2000-2068
+                values[index] += 1900 if values[index] >= 69 else 2000
+        return datetime(*values)
+
+
+class _DateFormatter(object):
+    """
+    Converts datetimes to strings using one date format, with a
+    %-interpolation template for fixed-width numeric formats.
+    """
+
+    _attributes = ('year', 'month', 'day', 'hour', 'minute', 'second')
+
+    def __init__(self, date_format):
+        self.date_format = date_format
+        self.template = None
+        compiled = _compile_date_format(date_format)
+        if compiled is not None:
+            slices, literals, length = compiled
+            pieces = [(pos, char.replace('%', '%%')) for pos, char in literals]
+            pieces.extend((x[2], '%%0%dd' % (x[3] - x[2])) for x in slices)
+            self.template = ''.join(x[1] for x in sorted(pieces))
+            self.arguments = [(x[0], self._attributes[x[1]]) for x in slices]
+
+    def __call__(self, value):
+        if self.template is None or value.year < 1000:
+            # strftime doesn't zero-pad years before 1000 on every platform
+            return str(value.strftime(self.date_format))
+        return self.template % tuple(
+            getattr(value, attribute) % 100 if directive == 'y' else getattr(value, attribute)
+            for directive, attribute in self.arguments
+        )
+
+
+#hex digit of a packed decimal's sign nibble -> sign
+_PACKED_SIGNS = {'a': '', 'c': '', 'e': '', 'f': '', 'b': '-', 'd': '-'}
+
+#last character of a zoned decimal -> (sign, digit)
+_ZONED_DIGITS = {}
+for _digit in range(10):
+    _ZONED_DIGITS[str(_digit)] = ('', str(_digit))
+    _ZONED_DIGITS['{ABCDEFGHI'[_digit]] = ('', str(_digit))
+    _ZONED_DIGITS['}JKLMNOPQR'[_digit]] = ('-', str(_digit))
+del _digit
+
+
+def _unscaled(value, exponent, rounding):
+
+    """
+    Returns 'value' rounded to 'exponent' as an integer number of units,
+    e.g. Decimal('12.345') with an exponent of Decimal('0.01') -> 1235.
+    """
 
-        for field_name, parameters in self.config.items():
+    if value.__class__ is not Decimal:
+        value = Decimal(value)
+    value = value.quantize(exponent, rounding)
+    return int(value.scaleb(-exponent.as_tuple().exponent))
 
-            if field_name in self.data:
 
-                if self.data[field_name] is None and 'default' in parameters:
-                    self.data[field_name] = parameters['default']
+def _parse_packed(suffix, blank, raw):
+
+    """
+    Converts the bytes of a packed decimal (two digits per byte, with the
+    sign in the last nibble) to a Decimal, using hexlify as the lookup
+    table. 'suffix' is an exponent such as 'E-2'.
+
+    'blank' is None, or a (default, space) tuple if the field has a
+    default, which is returned if the field is all spaces or NULs.
+    """
+
+    nibbles = hexlify(raw).decode('ascii')
+    digits = nibbles[:-1]
+    sign = _PACKED_SIGNS.get(nibbles[-1:])
+    if sign is None or not digits.isdigit():
+        if blank is None or (raw.strip(b'\x00') and raw.strip(blank[1])):
+            raise ValueError("Invalid packed decimal: %s" % (nibbles,))
+        return blank[0]
+    return Decimal(sign + digits + suffix)
+
+
+def _format_packed(exponent, rounding, length, encoding, value):
+
+    """
+    Converts 'value' to a packed decimal of 'length' bytes, returned as
+    text in 'encoding' so that it can be joined with the other fields.
+    """
+
+    number = _unscaled(value, exponent, rounding)
+    digits = str(abs(number)).zfill(length * 2 - 1)
+    if len(digits) > length * 2 - 1:
+        raise ValueError("%s does not fit in a %d byte packed decimal." % (value, length))
+    return unhexlify(digits + ('d' if number < 0 else 'c')).decode(encoding)
+
+
+def _parse_zoned(suffix, text):
+
+    """
+    Converts a zoned decimal, whose last character holds both the last
+    digit and the sign, to a Decimal.
+    """
+
+    text = text.strip()
+    sign, digit = _ZONED_DIGITS.get(text[-1:], (None, None))
+    if sign is None:
+        raise ValueError("Invalid zoned decimal: %s" % (text,))
+    return Decimal(sign + text[:-1] + digit + suffix)
+
+
+def _format_zoned(exponent, rounding, value):
+    number = _unscaled(value, exponent, rounding)
+    digits = str(abs(number))
+    overpunch = '}JKLMNOPQR' if number < 0 else '{ABCDEFGHI'
+    return digits[:-1] + overpunch[int(digits[-1])]
+
+
+def _encode(convert, encoding, text):
+    return convert(text.encode(encoding))
+
+
+def _decode(convert, encoding, raw):
+    return convert(raw.decode(encoding))
+
+
+#exceptions that formatting an invalid value may raise
+_FORMAT_ERRORS = (ValueError, TypeError, ArithmeticError, AttributeError)
+
+
+#exceptions that converting an invalid field may raise
+_PARSE_ERRORS = (ValueError, ArithmeticError, UnicodeError)
+
+
+def _check_line(plan, whitespace, record_length, line):
+
+    """
+    Returns a list of (field_name, reason) tuples for the problems with
+    the fields of 'plan' in 'line'. See Layout.checker.
+    """
+
+    errors = []
+    if len(line) != record_length:
+        errors.append((None, "Line is %d characters; should be %d."
+                       % (len(line), record_length)))
+
+    for (field_name, start, end, convert, required,
+         has_default, check_blank, expected) in plan:
+
+        row = line[start:end]
+        if expected is not None:
+            if row != expected:
+                errors.append((field_name, "%s has a value in the config, and a "
+                               "different value was passed in." % (field_name,)))
+            continue
+
+        if check_blank and not row.strip(whitespace):
+            if has_default:
+                continue
+            if required:
+                errors.append((field_name, "Field %s is required, but was not "
+                               "provided." % (field_name,)))
+                continue
+
+        try:
+            convert(row)
+        except _PARSE_ERRORS as error:
+            errors.append((field_name, "Field %s could not be converted: %s"
+                           % (field_name, error)))
+
+    return errors
+
+
+def _parse(plan, line):
+
+    """
+    Returns a new dict of the fields in 'plan' sliced from 'line'.
+    """
+
+    data = {}
+    for field_name, start, end, convert, has_default, default in plan:
+        row = line[start:end]
+        if has_default and not row.strip():
+            # Use default value if row is empty
+            data[field_name] = default
+        else:
+            data[field_name] = convert(row)
+    return data
+
+
+def _parse_bytes(plan, whitespace, line):
+
+    """
+    Returns a new dict of the fields in the bytes 'plan' sliced from 'line'.
+    """
+
+    data = {}
+    for field_name, start, end, convert, has_default, default in plan:
+        row = line[start:end]
+        if has_default and not row.strip(whitespace):
+            # Use default value if row is empty
+            data[field_name] = default
+        else:
+            data[field_name] = convert(row)
+    return data
+
+
+class Layout(object):
+    """
+    A compiled parse/build plan for a validated FixedWidth config.
+
+    All per-field config lookups (slice bounds, converters, formatters,
+    alignment and padding) are resolved once, so that parsing or emitting
+    a line is a single loop over flat tuples.
+
+    Lines may be text or bytes in 'encoding'. Bytes are sliced at byte
+    offsets and each field is decoded on its own; integers are converted
+    straight from the bytes if the encoding is ASCII-compatible.
+    """
+
+    def __init__(self, config, ordered_fields, fixed_point=False, date_cache_size=0,
+                 encoding='utf-8'):
+
+        """
+        Arguments:
+            config: a config dict already validated by FixedWidth
+            ordered_fields: (start_pos, field_name) tuples, sorted
+            fixed_point: boolean, omit the decimal point from decimals
+            date_cache_size: integer, distinct date strings memoized per field
+            encoding: string, codec of bytes lines
+        """
+
+        self.names = tuple(field_name for _, field_name in ordered_fields)
+        self.record_length = sum(config[x]['length'] for x in self.names)
+        self.formatters = {}
+
+        self.encoding = encoding
+        digits = u'0123456789+-. '
+        ascii_compatible = digits.encode(encoding, 'ignore') == digits.encode('ascii')
+        # None strips ASCII whitespace, which is faster
+        self.whitespace = None
+        if not ascii_compatible:
+            self.whitespace = u' \t\n\r\x0b\x0c'.encode(encoding, 'ignore')
+        self.single_byte = len(u'\u20ac\u00e9\u4e2d'.encode(encoding, 'replace')) == 3
+
+        parse_plan = []
+        bytes_plan = []
+        build_plan = []
+        check_plan = []
+        for start_pos, field_name in ordered_fields:
+            parameters = config[field_name]
+            field_type = parameters['type']
+
+            if field_type == 'integer':
+                convert, format = int, str
+            elif field_type == 'decimal':
+                exponent = None
+                convert = Decimal
+                if 'precision' in parameters:
+                    exponent = Decimal('0.%s' % ('0' * parameters['precision']))
+                    if fixed_point:
+                        convert = partial(_parse_implied_decimal,
+                                          Decimal(1).scaleb(-parameters['precision']))
+                format = partial(_format_decimal, exponent,
+                                 parameters.get('rounding'), fixed_point)
+            elif field_type == 'date':
+                convert = _DateParser(parameters['format'], date_cache_size)
+                format = _DateFormatter(parameters['format'])
+            elif field_type in ('packed', 'zoned'):
+                precision = parameters.get('precision', 0)
+                exponent = Decimal(1).scaleb(-precision)
+                suffix = 'E-%d' % (precision,)
+                rounding = parameters.get('rounding', ROUND_HALF_EVEN)
+                if field_type == 'zoned':
+                    convert = partial(_parse_zoned, suffix)
+                    format = partial(_format_zoned, exponent, rounding)
+                else:
+                    try:
+                        bytearray(range(256)).decode(encoding)
+                    except UnicodeDecodeError:
+                        raise ValueError("Field %s is packed, but encoding %s can \
+                            not represent every byte." % (field_name, encoding))
+                    # blank fields are checked by the converter instead,
+                    # since packed bytes may decode to whitespace
+                    blank = None
+                    if 'default' in parameters:
+                        blank = (parameters['default'], u' '.encode(encoding))
+                    convert = partial(_parse_packed, suffix, blank)
+                    format = partial(_format_packed, exponent, rounding,
+                                     parameters['length'], encoding)
+            else:
+                convert, format = _parse_string, str
+
+            if parameters['alignment'] == 'left':
+                justify = methodcaller(
+                    'ljust', parameters['length'], parameters['padding'])
+            else:
+                justify = methodcaller(
+                    'rjust', parameters['length'], parameters['padding'])
+
+            self.formatters[field_name] = format
+            has_default = 'default' in parameters and field_type != 'packed'
+            if field_type == 'packed':
+                bytes_convert = convert
+                convert = partial(_encode, convert, encoding)
+            elif convert is int and ascii_compatible:
+                bytes_convert = convert
+            else:
+                bytes_convert = partial(_decode, convert, encoding)
+            parse_plan.append((
+                field_name, start_pos - 1, parameters['end_pos'], convert,
+                has_default, parameters.get('default'),
+            ))
+            bytes_plan.append((
+                field_name, start_pos - 1, parameters['end_pos'], bytes_convert,
+                has_default, parameters.get('default'),
+            ))
+            build_plan.append((
+                field_name, format, justify, TYPE_TESTS[field_type], field_type,
+                parameters['length'], parameters['required'],
+                'default' in parameters, parameters.get('default'),
+                'value' in parameters, parameters.get('value'),
+            ))
+
+            expected = None
+            if 'value' in parameters:
+                try:
+                    expected = justify(format(parameters['value']))
+                except _FORMAT_ERRORS:
+                    pass
+            check_plan.append((
+                field_name, start_pos - 1, parameters['end_pos'], convert, bytes_convert,
+                parameters['required'], has_default, field_type != 'packed', expected,
+            ))
+
+        self.parse_plan = tuple(parse_plan)
+        self.check_plan = tuple(check_plan)
+        self.bytes_plan = tuple(bytes_plan)
+        self.build_plan = tuple(build_plan)
+        self._projections = {}
+
+    def projection(self, fields, binary=False):
+
+        """
+        Returns the parse plan (for bytes lines if 'binary') for just the
+        field names in 'fields'.
+        """
+
+        key = (tuple(fields), binary)
+        plan = self._projections.get(key)
+        if plan is None:
+            unknown = set(key[0]).difference(self.names)
+            if unknown:
+                raise ValueError("Unknown field(s): %s" % (', '.join(sorted(unknown)),))
+            plan = self.bytes_plan if binary else self.parse_plan
+            plan = tuple(x for x in plan if x[0] in key[0])
+            self._projections[key] = plan
+        return plan
+
+    def instrumented(self, stats):
+
+        """
+        Returns a copy of this Layout whose converters, formatters, parse
+        functions and render methods add their counts, times and failures
+        to the Stats 'stats'.
+        """
+
+        layout = _InstrumentedLayout.__new__(_InstrumentedLayout)
+        layout.__dict__.update(self.__dict__)
+        layout.stats = stats
+        layout._projections = {}
+
+        types = dict((x[0], x[4]) for x in self.build_plan)
+        timer = stats.timer
+        layout.parse_plan = tuple(
+            x[:3] + (timer('parse', x[0], types[x[0]], x[3]),) + x[4:]
+            for x in self.parse_plan)
+        layout.bytes_plan = tuple(
+            x[:3] + (timer('parse', x[0], types[x[0]], x[3]),) + x[4:]
+            for x in self.bytes_plan)
+        layout.check_plan = tuple(
+            x[:3] + (timer('parse', x[0], types[x[0]], x[3]),
+                     timer('parse', x[0], types[x[0]], x[4])) + x[5:]
+            for x in self.check_plan)
+        layout.formatters = dict(
+            (name, timer('format', name, types[name], format))
+            for name, format in self.formatters.items())
+        layout.build_plan = tuple(
+            (x[0], layout.formatters[x[0]]) + x[2:] for x in self.build_plan)
+        return layout
+
+    def parse(self, line, fields=None):
+
+        """
+        Returns a new dict of the fields in the fixed-width text or bytes
+        'line'. If 'fields' is given, only those fields are sliced and
+        converted.
+        """
+
+        return self.parser(fields, not isinstance(line, text_type))(line)
+
+    def field_map(self, fields=None, binary=False):
+
+        """
+        Returns a dict of field name -> (start, end, convert, has_default,
+        default) for the text (or, if 'binary', bytes) plan, limited to
+        'fields' if given.
+        """
+
+        key = ('map', None if fields is None else tuple(fields), binary)
+        field_map = self._projections.get(key)
+        if field_map is None:
+            if fields is None:
+                plan = self.bytes_plan if binary else self.parse_plan
+            else:
+                plan = self.projection(fields, binary)
+            field_map = self._projections[key] = dict((x[0], x[1:]) for x in plan)
+        return field_map
+
+    def parser(self, fields=None, binary=False):
+
+        """
+        Returns a function that parses a text (or, if 'binary', bytes) line
+        like self.parse(line, fields), with its plan looked up once.
+        """
+
+        if fields is None:
+            plan = self.bytes_plan if binary else self.parse_plan
+        else:
+            plan = self.projection(fields, binary)
+        if binary:
+            return partial(_parse_bytes, plan, self.whitespace)
+        return partial(_parse, plan)
+
+    def checker(self, binary=False):
+
+        """
+        Returns a function that checks a text (or, if 'binary', bytes) line
+        and returns a list of (field_name, reason) tuples for its problems:
+        a wrong length, required fields that are blank, hard-coded values
+        that differ and fields that can not be converted. The field name
+        is None for problems with the whole line.
+        """
+
+        plan = []
+        for (field_name, start, end, convert, bytes_convert, required,
+             has_default, check_blank, expected) in self.check_plan:
+            if binary:
+                convert = bytes_convert
+                if expected is not None:
+                    expected = expected.encode(self.encoding)
+            plan.append((field_name, start, end, convert, required,
+                         has_default, check_blank, expected))
+        whitespace = self.whitespace if binary else None
+        return partial(_check_line, tuple(plan), whitespace, self.record_length)
+
+    def render(self, data, fill=None, errors=None):
+
+        """
+        Validates the values in 'data' and returns their fixed-width
+        string, without a line end. Raises ValueError for the first field
+        that is not consistent with the config.
+
+        Default and hard-coded values are used for missing fields; they
+        are written back into 'fill' if it is given.
+
+        If 'errors' is a list, a (field_name, reason) tuple is appended to
+        it for every invalid field instead of raising, and those fields
+        are left blank.
+        """
+
+        return ''.join(self._render_fields(self.build_plan, data, fill, errors))
+
+    def validate(self, data, fill=None, errors=None):
+
+        """
+        Validates 'data' like self.render and returns the same string, for
+        callers that check records rather than emit lines; instrumented
+        layouts count it apart from emitted lines.
+        """
+
+        return ''.join(self._render_fields(self.build_plan, data, fill, errors))
+
+    def _render_fields(self, plan, data, fill, errors):
+
+        """
+        Returns a list of the padded strings of the fields in the build
+        'plan', validated as described in self.render.
+        """
+
+        parts = []
+        for (field_name, format, justify, type_test, field_type, length,
+             required, has_default, default, has_value, value) in plan:
+
+            message = None
+            field_data = ''
+
+            if field_name in data:
+
+                datum = data[field_name]
+                if datum is None and has_default:
+                    datum = default
+                    if fill is not None:
+                        fill[field_name] = datum
 
-                data = self.data[field_name]
                 # make sure passed in value is of the proper type
                 # but only if a value is set
-                if data and not type_tests[parameters['type']](data):
-                    raise ValueError("%s is defined as a %s, \
+                if datum and not type_test(datum):
+                    message = "%s is defined as a %s, \
                     but the value is not of that type." \
-                    % (field_name, parameters['type']))
+                    % (field_name, field_type)
 
-                #ensure value passed in is not too long for the field
-                field_data = self._format_field(field_name)
-                if len(str(field_data)) > parameters['length']:
-                    raise ValueError("%s is too long (limited to %d \
-                        characters)." % (field_name, parameters['length']))
-
-                if 'value' in parameters \
-                    and parameters['value'] != field_data:
-
-                    raise ValueError("%s has a value in the config, \
-                        and a different value was passed in." % (field_name,))
+                else:
+                    #ensure value passed in is not too long for the field
+                    try:
+                        field_data = '' if datum is None else format(datum)
+                    except _FORMAT_ERRORS as error:
+                        if errors is None:
+                            raise
+                        message = str(error)
+                    if message is not None:
+                        pass
+                    elif len(field_data) > length:
+                        message = "%s is too long (limited to %d \
+                            characters)." % (field_name, length)
+
+                    elif has_value and value != field_data:
+                        message = "%s has a value in the config, \
+                            and a different value was passed in." % (field_name,)
 
             else: #no value passed in
 
                 #if required but not provided
-                if parameters['required'] and ('value' not in parameters):
-                    raise ValueError("Field %s is required, but was \
-                        not provided." % (field_name,))
+                if required and not has_value:
+                    message = "Field %s is required, but was \
+                        not provided." % (field_name,)
+
+                #use the hard-coded value, else the default value
+                datum = value if has_value else default
+                if fill is not None and (has_default or has_value):
+                    fill[field_name] = datum
+                if message is None:
+                    try:
+                        field_data = '' if datum is None else format(datum)
+                    except _FORMAT_ERRORS as error:
+                        if errors is None:
+                            raise
+                        message = str(error)
 
-                #if there's a default value
-                if 'default' in parameters:
-                    self.data[field_name] = parameters['default']
+            if message is None and required and datum is None:
+                # None gets checked last because it may be set with a default value
+                message = "None value not allowed for %s" % (field_name)
 
-                #if there's a hard-coded value in the config
-                if 'value' in parameters:
-                    self.data[field_name] = parameters['value']
+            if message is not None:
+                if errors is None:
+                    raise ValueError(message)
+                errors.append((field_name, ' '.join(message.split())))
+                field_data = ''
 
-            if parameters['required'] and self.data[field_name] is None:
-                # None gets checked last because it may be set with a default value
-                raise ValueError("None value not allowed for %s" % (field_name))
+            parts.append(justify(field_data))
 
-        return True
+        return parts
+
+    def templated(self, fields, binary=False):
 
-    def _get_decimal_data(self, field_name):
         """
-        quantizes field if it is decimal type and precision is set
+        Returns a function that renders a dict like self.render (or, if
+        'binary', self.render_bytes), but only formats the fields named in
+        'fields'. Every other field is rendered once, from its config
+        value or default, into a line template; the function raises
+        ValueError if the dict has a different value for one of them.
+        Raises ValueError if a field outside 'fields' is required and has
+        no config value.
         """
-        value = str(self.data[field_name])
-        if 'precision' in self.config[field_name]:
-            value = str(Decimal(value).
-                        quantize(Decimal('0.%s' % ('0' *
-                        self.config[field_name]['precision'])),
-                        self.config[field_name]['rounding']))
-        if self.fixed_point:
-            value = value.replace('.', '')
-        return value
 
-    def _get_date_data(self, field_name):
-        return str(self.data[field_name].strftime(self.config[field_name]['format']))
+        unknown = set(fields).difference(self.names)
+        if unknown:
+            raise ValueError("Unknown field(s): %s" % (', '.join(sorted(unknown)),))
+
+        constants = [x for x in self.build_plan if x[0] not in fields]
+        line = ''.join(self._render_fields(constants, {}, None, None))
+        #field name -> the config value or default the template holds
+        constants = tuple((x[0], x[10] if x[9] else x[8]) for x in constants)
+        pieces = []
+        plan = []
+        position = 0
+        for entry in self.build_plan:
+            if entry[0] in fields:
+                pieces.append('%s')
+                plan.append(entry)
+            else:
+                pieces.append(line[position:position + entry[5]].replace('%', '%%'))
+                position += entry[5]
+        render = partial(_render_template, ''.join(pieces), tuple(plan),
+                         constants, self._render_fields)
+        if binary:
+            return partial(_encode_line, render, self.encoding,
+                           None if self.single_byte else self.record_length)
+        return render
+
+    def render_bytes(self, data, fill=None):
 
-    def _format_field(self, field_name):
         """
-        Converts field data and returns it as a string.
+        Returns self.render(data, fill) encoded using self.encoding.
+        Raises ValueError if the encoded line is not the record length.
         """
-        data = self.data[field_name]
-        config = self.config[field_name]
-        if data is None:
-            # Empty fields can not be formatted
-            return ''
-        type = config['type']
-        return str(self.format_functions[type](field_name) if not None else '')
 
-    def _build_line(self):
+        line = self.render(data, fill).encode(self.encoding)
+        if not self.single_byte and len(line) != self.record_length:
+            raise ValueError("Line is %d bytes when encoded as %s; \
+                should be %d." % (len(line), self.encoding, self.record_length))
+        return line
+
+
+def _render_template(template, plan, constants, render_fields, data):
+
+    """
+    Returns 'template' filled in with the fields of 'plan' rendered from
+    'data', after checking that 'data' has no other value for the fields
+    in 'constants'. See Layout.templated.
+    """
+
+    for field_name, constant in constants:
+        if field_name in data:
+            datum = data[field_name]
+            if datum is not None and datum != constant:
+                raise ValueError("%s is written from its config value or \
+                    default, and a different value was passed in." % (field_name,))
+    return template % tuple(render_fields(plan, data, None, None))
+
+
+def _encode_line(render, encoding, record_length, data):
+
+    """
+    Returns render(data) encoded, checking its length in bytes if
+    'record_length' is not None.
+    """
+
+    line = render(data).encode(encoding)
+    if record_length is not None and len(line) != record_length:
+        raise ValueError("Line is %d bytes when encoded as %s; \
+            should be %d." % (len(line), encoding, record_length))
+    return line
+
+
+class _InstrumentedLayout(Layout):
+    """
+    A Layout that adds the time, records and characters (or bytes) of
+    every line it parses or renders to self.stats. See Layout.instrumented.
+    """
+
+    def parser(self, fields=None, binary=False):
+        return partial(_timed_line, self.stats.totals['parse'],
+                       Layout.parser(self, fields, binary))
+
+    def render(self, data, fill=None, errors=None):
+        return _timed_render(self.stats.totals['emit'], partial(Layout.render, self),
+                             data, fill, errors)
+
+    def validate(self, data, fill=None, errors=None):
+        return _timed_render(self.stats.totals['validate'],
+                             partial(Layout.validate, self), data, fill, errors)
+
+    def templated(self, fields, binary=False):
+        return partial(_timed_render, self.stats.totals['emit'],
+                       Layout.templated(self, fields, binary))
+
+
+def _timed_render(totals, render, data, *args):
+
+    """
+    Returns render(data, *args), adding a record, its length and the time
+    taken to the [records, size, seconds] list 'totals'.
+    """
+
+    start = default_timer()
+    try:
+        line = render(data, *args)
+    finally:
+        totals[2] += default_timer() - start
+    totals[0] += 1
+    totals[1] += len(line)
+    return line
+
+
+def _timed_line(totals, parse, line):
+
+    """
+    Returns parse(line), adding a record, its length and the time taken
+    to the [records, size, seconds] list 'totals'.
+    """
+
+    start = default_timer()
+    try:
+        return parse(line)
+    finally:
+        totals[2] += default_timer() - start
+        totals[0] += 1
+        totals[1] += len(line)
+
+
+def _timed_call(entry, callback, name, field_type, operation, function, value):
+
+    """
+    Returns function(value), adding a call, the time taken and any failure
+    to the [count, seconds, failures] list 'entry'. See Stats.timer.
+    """
+
+    start = default_timer()
+    try:
+        result = function(value)
+    except Exception as error:
+        seconds = default_timer() - start
+        entry[0] += 1
+        entry[1] += seconds
+        entry[2] += 1
+        if callback is not None:
+            callback(operation, name, field_type, seconds, error)
+        raise
+    seconds = default_timer() - start
+    entry[0] += 1
+    entry[1] += seconds
+    if callback is not None:
+        callback(operation, name, field_type, seconds, None)
+    return result
+
+
+FieldStats = namedtuple('FieldStats', [
+    'operation', 'field', 'type', 'count', 'seconds', 'failures'])
+
+
+class Stats(object):
+    """
+    Counts, times and failures of the field conversions (operation
+    'parse') and formatting (operation 'format') of an instrumented
+    FixedWidth, and the records, characters (or bytes) and time of the
+    lines it parsed, emitted and validated without emitting them (by
+    validate(), is_valid and validate_records). See FixedWidth.instrument.
+
+    If 'callback' is given, it is called after every field conversion
+    with (operation, field_name, field_type, seconds, error), where
+    error is None unless the conversion raised.
+
+    Example:
+        stats = fw.instrument()
+        for record in fw.iter_records(infile):
+            ...
+        for row in stats.field_stats()[:5]:
+            print(row.field, row.count, row.seconds)
+        records_per_second, bytes_per_second = stats.rate('parse')
+    """
+
+    def __init__(self, callback=None):
+        self.callback = callback
+        #(operation, field_name, field_type) -> [count, seconds, failures]
+        self.fields = {}
+        #operation -> [records, characters or bytes, seconds]
+        self.totals = {'parse': [0, 0, 0.0], 'emit': [0, 0, 0.0],
+                       'validate': [0, 0, 0.0]}
+
+    def reset(self):
 
         """
-        Returns a fixed-width line made up of self.data, using
-        self.config.
+        Sets every count and time back to zero.
         """
 
-        self.validate()
+        # the lists are shared with the timed functions, so clear them in place
+        for entry in self.fields.values():
+            entry[:] = [0, 0.0, 0]
+        for totals in self.totals.values():
+            totals[:] = [0, 0, 0.0]
 
-        line = ''
-        #for start_pos, field_name in self.ordered_fields:
-        for field_name in [x[1] for x in self.ordered_fields]:
+    def timer(self, operation, name, field_type, function):
 
-            if field_name in self.data:
-                datum = self._format_field(field_name)
-            else:
-                datum = ''
+        """
+        Returns a function that calls 'function' and adds its time to the
+        stats of field 'name'.
+        """
 
-            justify = None
-            if self.config[field_name]['alignment'] == 'left':
-                justify = datum.ljust
-            else:
-                justify = datum.rjust
+        entry = self.fields.setdefault((operation, name, field_type), [0, 0.0, 0])
+        return partial(_timed_call, entry, self.callback, name, field_type,
+                       operation, function)
 
-            datum = justify(self.config[field_name]['length'], \
-                self.config[field_name]['padding'])
+    def field_stats(self):
 
-            line += datum
+        """
+        Returns a FieldStats tuple for each field and operation, slowest
+        first.
+        """
 
-        return line + self.line_end
+        rows = [FieldStats(operation, name, field_type, *entry)
+                for (operation, name, field_type), entry in self.fields.items()]
+        return sorted(rows, key=lambda x: -x.seconds)
 
-    is_valid = property(validate)
+    def type_stats(self):
 
-    def _string_to_dict(self, fw_string):
+        """
+        Returns a FieldStats tuple, with a field of None, for each field
+        type and operation, slowest first.
+        """
+
+        totals = {}
+        for (operation, name, field_type), entry in self.fields.items():
+            total = totals.setdefault((operation, field_type), [0, 0.0, 0])
+            for index, value in enumerate(entry):
+                total[index] += value
+        rows = [FieldStats(operation, None, field_type, *entry)
+                for (operation, field_type), entry in totals.items()]
+        return sorted(rows, key=lambda x: -x.seconds)
+
+    def rate(self, operation):
 
         """
-        Take a fixed-width string and use it to
-        populate self.data, based on self.config.
+        Returns the (records per second, characters or bytes per second)
+        of the lines parsed (operation 'parse'), emitted ('emit') or
+        validated ('validate').
         """
 
-        self.data = {}
+        records, size, seconds = self.totals[operation]
+        if not seconds:
+            return (0.0, 0.0)
+        return (records / seconds, size / seconds)
+
 
-        for start_pos, field_name in self.ordered_fields:
+class Record(Mapping):
+    """
+    A mapping view of one fixed-width line that converts each field only
+    when it is first read, then caches it.
 
-            conversion = {
-                'integer': int,
-                'string': lambda x: str(x).strip(),
-                'decimal': Decimal,
-                'numeric': lambda x: str(x).strip(),
-                'date': lambda x: datetime.strptime(x, self.config[field_name]['format']),
-            }
+    Fields can be read as items or attributes (record['amount'] or
+    record.amount) and changed as items. A record renders as a copy of
+    its original line with only its changed fields formatted into it, so
+    it can be written back out without formatting the other fields.
+    """
 
-            row = fw_string[start_pos - 1:self.config[field_name]['end_pos']]
-            if row.strip() == '' and 'default' in self.config[field_name]:
-                # Use default value if row is empty
-                self.data[field_name] = self.config[field_name]['default']
-            else:
-                self.data[field_name] = conversion[self.config[field_name]['type']](row)
+    __slots__ = ('layout', 'line', '_fields', '_values', '_changed')
 
-        return self.data
+    def __init__(self, layout, line, fields=None):
 
-    line = property(_build_line, _string_to_dict)
+        """
+        Arguments:
+            layout: the Layout of the line
+            line: the text or bytes of one record, without its line end
+            fields: optional, the names of the only fields to expose
+        """
+
+        self.layout = layout
+        self.line = line
+        self._fields = layout.field_map(fields, not isinstance(line, text_type))
+        self._values = {}
+        self._changed = set()
+
+    def __getitem__(self, field_name):
+        try:
+            return self._values[field_name]
+        except KeyError:
+            pass
+
+        start, end, convert, has_default, default = self._fields[field_name]
+        row = self.line[start:end]
+        if has_default and not row.strip(None if isinstance(row, text_type)
+                                         else self.layout.whitespace):
+            value = default
+        else:
+            value = convert(row)
+        self._values[field_name] = value
+        return value
+
+    def __getattr__(self, name):
+        # slots (unset while copying or unpickling) and special names are
+        # never fields, and looking them up as fields would recurse
+        if name.startswith('_'):
+            raise AttributeError(name)
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __setitem__(self, field_name, value):
+        if field_name not in self._fields:
+            raise KeyError(field_name)
+        self._values[field_name] = value
+        self._changed.add(field_name)
+
+    def __contains__(self, field_name):
+        return field_name in self._fields
+
+    def __iter__(self):
+        return iter(self._fields)
+
+    def __len__(self):
+        return len(self._fields)
+
+    def __repr__(self):
+        return 'Record(%r)' % (self.line,)
+
+    def __copy__(self):
+        record = Record.__new__(Record)
+        record.layout = self.layout
+        record.line = self.line
+        record._fields = self._fields
+        record._values = dict(self._values)
+        record._changed = set(self._changed)
+        return record
+
+    def to_dict(self):
+
+        """
+        Returns a new dict of every field.
+        """
+
+        return dict((x, self[x]) for x in self._fields)
+
+    def render(self, binary=False):
+
+        """
+        Returns the record's line, as bytes if 'binary', without a line
+        end: the original line, with each changed field validated and
+        formatted like Layout.render and written over its span. Fields
+        that were not changed are copied as they are, including any not
+        exposed by 'fields'.
+        """
+
+        layout = self.layout
+        line = self.line
+        if self._changed:
+            text = isinstance(line, text_type)
+            positions = layout.field_map(None, not text)
+            plan = tuple(x for x in layout.build_plan if x[0] in self._changed)
+            parts = layout._render_fields(plan, self._values, None, None)
+            for entry, part in zip(plan, parts):
+                start, end = positions[entry[0]][:2]
+                if not text:
+                    part = part.encode(layout.encoding)
+                    if len(part) != end - start:
+                        raise ValueError("Field %s is %d bytes when encoded as %s; \
+                            should be %d." % (entry[0], len(part), layout.encoding,
+                                              end - start))
+                line = line[:start] + part + line[end:]
+
+        if binary == isinstance(line, text_type):
+            if binary:
+                return line.encode(layout.encoding)
+            return line.decode(layout.encoding)
+        return line
@@ -0,0 +1,201 @@
+"""
+Files that mix record types with different layouts, such as header,
+detail and trailer records, told apart by a discriminator field.
+"""
+import io
+
+from six import text_type
+
+from .fixedwidth import CHUNK_SIZE
+
+
+class Totals(object):
+    """
+    Record counts per record type and running sums of chosen fields,
+    kept up to date as MultiLayout reads or writes each record.
+
+    Arguments:
+        sums: optional, dict of record type -> names of fields to sum
+
+    Example:
+        totals = Totals({'D': ['amount']})
+        for kind, record in layouts.iter_records(infile, totals):
+            if kind == 'T' and record['total'] != totals.sums['D', 'amount']:
+                raise ValueError("Trailer total does not match.")
+    """
+
+    def __init__(self, sums=None):
+        self.fields = dict((key, tuple(value)) for key, value in (sums or {}).items())
+        #record type -> number of records
+        self.counts = {}
+        #(record type, field name) -> sum of its non-empty values
+        self.sums = dict(((key, x), 0) for key, value in self.fields.items() for x in value)
+
+    def add(self, key, record):
+
+        """
+        Counts 'record', of record type 'key', and adds its summed fields.
+        """
+
+        self.counts[key] = self.counts.get(key, 0) + 1
+        for field_name in self.fields.get(key, ()):
+            value = record[field_name]
+            if value is not None:
+                self.sums[key, field_name] += value
+
+
+class MultiLayout(object):
+    """
+    Reads and writes files whose lines have different FixedWidth layouts,
+    chosen by the value of a discriminator field at the same position in
+    every line.
+
+    Each line is dispatched with one dict lookup on its discriminator
+    slice, to a parser prepared for that record type.
+
+    Example:
+        layouts = MultiLayout(1, 1, {'H': header, 'D': detail, 'T': trailer})
+        for kind, record in layouts.iter_records(infile):
+            ...
+    """
+
+    def __init__(self, start_pos, length, layouts):
+
+        """
+        Arguments:
+            start_pos: the position of the discriminator field, from 1
+            length: the length of the discriminator field
+            layouts: dict of discriminator value -> FixedWidth object; the
+                key None, if present, is used for any other value
+
+        Every FixedWidth object must have the same line_end and encoding.
+        Unless they all have the same record length, line_end must not be
+        empty.
+        """
+
+        if not layouts:
+            raise ValueError("At least one layout is required.")
+        self.start = start_pos - 1
+        self.end = self.start + length
+        self.layouts = dict(layouts)
+
+        objects = list(self.layouts.values())
+        self.line_end = objects[0].line_end
+        self.encoding = objects[0].encoding
+        for key, fw in self.layouts.items():
+            if (fw.line_end, fw.encoding) != (self.line_end, self.encoding):
+                raise ValueError("Layout %r has a different line_end or \
+                    encoding." % (key,))
+            if key is not None and len(key) != length:
+                raise ValueError("Discriminator %r is not %d characters." \
+                    % (key, length))
+            if fw.layout.record_length < self.end:
+                raise ValueError("Layout %r is shorter than the discriminator." \
+                    % (key,))
+        if not self.line_end and len(set(x.layout.record_length for x in objects)) > 1:
+            raise ValueError("A line_end is required when record lengths differ.")
+        self._first = objects[0]
+        self._max_length = max(x.layout.record_length for x in objects)
+
+    def _parsers(self, fields, binary):
+
+        """
+        Returns a dict of discriminator slice -> (record type, parser),
+        and the entry for other values (or None).
+        """
+
+        fields = fields or {}
+        table = {}
+        for key, fw in self.layouts.items():
+            parse = fw.layout.parser(fields.get(key), binary)
+            raw = key
+            if binary and key is not None:
+                raw = key.encode(self.encoding)
+            table[raw] = (key, parse)
+        return table, table.pop(None, None)
+
+    def iter_records(self, fileobj, totals=None, fields=None, chunk_size=CHUNK_SIZE):
+
+        """
+        Yields a (record type, dict) tuple for each line of 'fileobj',
+        which is read like FixedWidth.iter_records. Raises ValueError for
+        a line with an unknown discriminator.
+
+        Arguments:
+            totals: optional, a Totals object updated before each record
+                is yielded
+            fields: optional, dict of record type -> names of the only
+                fields to convert for that type
+        """
+
+        if fields and totals is not None:
+            for key, names in totals.fields.items():
+                if key in fields and set(names).difference(fields[key]):
+                    raise ValueError("Summed fields of %r must be in its \
+                        fields." % (key,))
+
+        lines, binary = self._first._read_lines(fileobj, chunk_size, self._max_length)
+        table, other = self._parsers(fields, binary)
+        get = table.get
+        start = self.start
+        end = self.end
+        for number, line in enumerate(lines, 1):
+            key, parse = get(line[start:end], other) or (None, None)
+            if parse is None:
+                raise ValueError("Line %d has an unknown record type %r." \
+                    % (number, line[start:end]))
+            record = parse(line)
+            if key is None:
+                key = line[start:end]
+                if not isinstance(key, text_type):
+                    key = key.decode(self.encoding)
+            if totals is not None:
+                totals.add(key, record)
+            yield key, record
+
+    def write_records(self, records, fileobj, totals=None, buffer_size=CHUNK_SIZE):
+
+        """
+        Writes a line for each (record type, dict) tuple in 'records' to
+        'fileobj', like FixedWidth.write_records, and returns the number
+        of lines written.
+
+        If 'totals' is given, each record is added to it once it has been
+        rendered, so a generator of records can read it to build the
+        trailer record.
+        """
+
+        binary = isinstance(fileobj, (io.RawIOBase, io.BufferedIOBase)) \
+            or 'b' in getattr(fileobj, 'mode', '')
+        line_end = self.line_end
+        join = ''.join
+        if binary:
+            line_end = line_end.encode(self.encoding)
+            join = b''.join
+        renders = dict(
+            (key, fw.layout.render_bytes if binary else fw.layout.render)
+            for key, fw in self.layouts.items() if key is not None)
+        write = fileobj.write
+
+        count = 0
+        size = 0
+        lines = []
+        for key, record in records:
+            try:
+                render = renders[key]
+            except KeyError:
+                raise ValueError("Unknown record type %r." % (key,))
+            line = render(record) + line_end
+            if totals is not None:
+                totals.add(key, record)
+            lines.append(line)
+            size += len(line)
+            if size >= buffer_size:
+                write(join(lines))
+                count += len(lines)
+                size = 0
+                lines = []
+        if lines:
+            write(join(lines))
+            count += len(lines)
+        return count
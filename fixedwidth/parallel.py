@@ -0,0 +1,136 @@
+"""
+Parallel parsing of fixed-width files across a pool of processes.
+
+Every record in a fixed-width file has the same length, so a file can be
+split into byte-exact shards without scanning for line ends. Each worker
+parses whole shards with the same semantics as FixedWidth.iter_records,
+and the results are yielded in file order.
+"""
+from collections import deque
+from itertools import islice
+from multiprocessing import Pool, cpu_count
+import os
+
+from .fixedwidth import FixedWidth, _count_records
+
+#number of records handed to a worker at a time
+SHARD_RECORDS = 50000
+
+_worker = {}
+
+
+def _init_worker(schema, fields):
+
+    """
+    Builds the FixedWidth object and parser used by this worker process.
+    """
+
+    _worker['fw'] = fw = FixedWidth(schema)
+    _worker['parse'] = fw.layout.parser(fields, binary=True)
+
+
+def _parse_shard(shard):
+
+    """
+    Parses 'count' records starting at byte 'offset' of the file at 'path'.
+    """
+
+    path, offset, count, record_size = shard
+    fw = _worker['fw']
+    parse = _worker['parse']
+    record_length = fw.layout.record_length
+
+    with open(path, 'rb') as infile:
+        infile.seek(offset)
+        data = infile.read(count * record_size)
+
+    return [
+        parse(data[pos:pos + record_length])
+        for pos in range(0, count * record_size, record_size)
+    ]
+
+
+def _shards(fw, path, shard_records):
+
+    """
+    Returns an iterator over a (path, offset, count, record_size) tuple
+    for each shard of the file at 'path'. Raises ValueError at once if the
+    file size is not a whole number of records.
+    """
+
+    record_length = fw.layout.record_length
+    record_size = record_length + len(fw.line_end.encode(fw.encoding))
+    records = _count_records(os.path.getsize(path), record_length, record_size)
+
+    return (
+        (path, first * record_size, min(shard_records, records - first), record_size)
+        for first in range(0, records, shard_records)
+    )
+
+
+def iter_records(fw, path, fields=None, processes=None, shard_records=SHARD_RECORDS):
+
+    """
+    Yields a new dict for each record in the file at 'path', in order,
+    parsing shards of 'shard_records' records in a pool of 'processes'
+    worker processes (default: one per CPU). If 'fields' is given, only
+    those fields are sliced and converted.
+
+    Offsets are computed from the record length, so field positions are
+    byte offsets in fw.encoding. At most two shards per process are held
+    in memory at a time.
+
+    Unknown field names and a file size that is not a whole number of
+    records raise ValueError when this is called, not when the first
+    record is read.
+    """
+
+    fw.layout.parser(fields)
+    shards = _shards(fw, path, shard_records)
+    return _iter_shards(fw, shards, fields, processes or cpu_count())
+
+
+def _iter_shards(fw, shards, fields, processes):
+
+    """
+    Yields the records of 'shards', parsed in a pool of 'processes'
+    worker processes. See iter_records.
+    """
+
+    pool = Pool(processes, _init_worker, (fw.schema, fields))
+    try:
+        pending = deque(
+            pool.apply_async(_parse_shard, (shard,))
+            for shard in islice(shards, processes * 2)
+        )
+        while pending:
+            records = pending.popleft().get()
+            shard = next(shards, None)
+            if shard is not None:
+                pending.append(pool.apply_async(_parse_shard, (shard,)))
+            for record in records:
+                yield record
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def parse_file(fw, path, callback=None, fields=None, processes=None,
+               shard_records=SHARD_RECORDS):
+
+    """
+    Parses the file at 'path' in parallel, like iter_records.
+
+    Returns a list of the records in order or, if 'callback' is given,
+    calls it with each record in order and returns the number of records.
+    """
+
+    records = iter_records(fw, path, fields, processes, shard_records)
+    if callback is None:
+        return list(records)
+
+    count = 0
+    for record in records:
+        callback(record)
+        count += 1
+    return count
@@ -0,0 +1,103 @@
+"""
+Random access to the records of a fixed-width file through mmap.
+"""
+import mmap
+import os
+
+from functools import partial
+
+from .fixedwidth import Record, _count_records
+
+
+class FixedWidthFile(object):
+    """
+    A read-only, list-like view of the records in a fixed-width file.
+
+    The file is memory-mapped and record offsets are computed from the
+    record length, so len(), indexing and slicing decode only the records
+    asked for, straight from the mapped bytes. Field positions are byte
+    offsets in fw.encoding.
+
+    Example:
+        with FixedWidthFile(fw, 'input.txt', fields=['amount']) as records:
+            last = records[-1]
+            sample = records[1000:1010]
+    """
+
+    def __init__(self, fw, path, fields=None, lazy=False):
+
+        """
+        Arguments:
+            fw: a FixedWidth object describing the records
+            path: the file to read
+            fields: optional, the names of the only fields to decode
+            lazy: if true, return Record views instead of dicts
+        """
+
+        self.fw = fw
+        self.path = path
+        self.fields = fields
+        self.record_length = fw.layout.record_length
+        self.record_size = self.record_length + len(fw.line_end.encode(fw.encoding))
+
+        if lazy:
+            fw.layout.field_map(fields, binary=True)
+            self._parse = partial(Record, fw.layout, fields=fields)
+        else:
+            self._parse = fw.layout.parser(fields, binary=True)
+
+        self._file = open(path, 'rb')
+        self._mmap = None
+        try:
+            size = os.fstat(self._file.fileno()).st_size
+            self._length = _count_records(size, self.record_length, self.record_size)
+            if size:
+                self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self._file.close()
+            raise
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index):
+
+        """
+        Returns a new dict for the record at 'index', or a list of them
+        if 'index' is a slice.
+        """
+
+        if isinstance(index, slice):
+            return [self._record(x) for x in range(*index.indices(self._length))]
+
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("record index out of range")
+        return self._record(index)
+
+    def __iter__(self):
+        for index in range(self._length):
+            yield self._record(index)
+
+    def _record(self, index):
+        start = index * self.record_size
+        line = self._mmap[start:start + self.record_length]
+        return self._parse(line)
+
+    def close(self):
+
+        """
+        Unmaps and closes the file.
+        """
+
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,275 @@
+"""
+External sort of fixed-width files by the values of key fields.
+"""
+from collections import deque
+from heapq import merge
+from multiprocessing import Pool, cpu_count
+import io
+import os
+import tempfile
+
+from six import string_types
+
+from .fixedwidth import CHUNK_SIZE, FixedWidth, _split_records
+
+#number of records sorted in memory before they are spilled to a run file
+RUN_RECORDS = 100000
+
+_worker = {}
+
+
+def sort_file(fw, infile, outfile, keys, reverse=False, processes=None,
+              run_records=RUN_RECORDS, chunk_size=CHUNK_SIZE):
+
+    """
+    Writes the records of 'infile' to 'outfile' sorted by the fields
+    named in 'keys' (descending if 'reverse'), and returns the number of
+    records written. Both files must be opened in the same mode, and are
+    read like FixedWidth.iter_records.
+
+    Only the key fields are sliced and converted; each line is written
+    back exactly as it was read, followed by fw.line_end. Empty key fields
+    whose default is None sort first. The sort is stable.
+
+    Runs of 'run_records' records are sorted in memory and, if there is
+    more than one, spilled to temporary files and merged, so memory use
+    does not grow with the file. If 'processes' is given, runs are sorted
+    in a pool of that many worker processes (0 for one per CPU).
+    """
+
+    # fail early on unknown field names
+    fw.layout.projection(keys)
+    lines, binary = fw._read_lines(infile, chunk_size)
+    line_end = fw.line_end.encode(fw.encoding) if binary else fw.line_end
+    join = b''.join if binary else u''.join
+    write = outfile.write
+
+    runs = []
+    try:
+        records = _sorted_lines(fw, lines, binary, keys, True, reverse, runs,
+                                run_records, chunk_size, processes)
+        count = 0
+        block = []
+        for _, line in records:
+            block.append(line)
+            block.append(line_end)
+            count += 1
+            if len(block) >= 2000:
+                write(join(block))
+                block = []
+        if block:
+            write(join(block))
+    finally:
+        _close_runs(runs)
+    return count
+
+
+class _Reversed(object):
+    """
+    Wraps a sort key so that it sorts in reverse.
+    """
+
+    __slots__ = ('key',)
+
+    def __init__(self, key):
+        self.key = key
+
+    def __lt__(self, other):
+        return other.key < self.key
+
+    def __eq__(self, other):
+        return self.key == other.key
+
+    def __ne__(self, other):
+        return self.key != other.key
+
+
+def _key_function(layout, keys, binary, convert):
+
+    """
+    Returns a function that returns the sort key of a line: a tuple of
+    the converted key fields if 'convert', else the raw key slices.
+    """
+
+    field_map = layout.field_map(None, binary)
+    if not convert:
+        slices = [slice(*field_map[x][:2]) for x in keys]
+        if len(slices) == 1:
+            key_slice = slices[0]
+            return lambda line: line[key_slice]
+        return lambda line: tuple(line[x] for x in slices)
+
+    whitespace = layout.whitespace if binary else None
+    plan = [field_map[x] for x in keys]
+
+    def key_of(line):
+        key = []
+        for start, end, convert, has_default, default in plan:
+            row = line[start:end]
+            if has_default and not row.strip(whitespace):
+                value = default
+            else:
+                value = convert(row)
+            # None sorts first, and is never compared with a value
+            key.append((value is not None, value))
+        return tuple(key)
+    return key_of
+
+
+def _sorted_lines(fw, lines, binary, keys, convert, reverse, runs, run_records,
+                  chunk_size, processes=None):
+
+    """
+    Returns an iterator over stably sorted (key, line) tuples for 'lines',
+    using _key_function(fw.layout, keys, binary, convert).
+
+    Runs of 'run_records' lines are sorted in memory, in a pool of
+    'processes' worker processes if it is not None, with at most two runs
+    per process in flight. If there is more than one run, each is written
+    to a temporary file, appended to 'runs' for the caller to close with
+    _close_runs, and the runs are merged.
+    """
+
+    key_of = _key_function(fw.layout, keys, binary, convert)
+    line_end = fw.line_end.encode(fw.encoding) if binary else fw.line_end
+    first = len(runs)
+
+    run = []
+    if processes is None:
+        for line in lines:
+            run.append(line)
+            if len(run) >= run_records:
+                runs.append(_write_run(_sort_run(key_of, reverse, run), line_end, binary))
+                run = []
+    else:
+        processes = processes or cpu_count()
+        pool = Pool(processes, _init_worker,
+                    (fw.schema, keys, binary, convert, reverse, line_end))
+        pending = deque()
+        try:
+            for line in lines:
+                run.append(line)
+                if len(run) >= run_records:
+                    pending.append(pool.apply_async(_sort_run_worker, (run,)))
+                    run = []
+                    if len(pending) >= processes * 2:
+                        runs.append(_open_run(pending.popleft().get(), binary))
+            if run and (pending or len(runs) > first):
+                pending.append(pool.apply_async(_sort_run_worker, (run,)))
+                run = []
+            while pending:
+                runs.append(_open_run(pending.popleft().get(), binary))
+        except Exception:
+            # keep the run files already written, so the caller removes them
+            for result in pending:
+                try:
+                    runs.append(_open_run(result.get(), binary))
+                except Exception:
+                    pass
+            raise
+        finally:
+            pool.terminate()
+            pool.join()
+
+    if len(runs) == first:
+        return iter(_sort_run(key_of, reverse, run))
+    if run:
+        runs.append(_write_run(_sort_run(key_of, reverse, run), line_end, binary))
+
+    wrap = _Reversed if reverse else (lambda key: key)
+    record_length = fw.layout.record_length
+
+    def decorated(index, runfile):
+        read = runfile.read
+        lines = _split_records(read, read(chunk_size), chunk_size, line_end, record_length)
+        for position, line in enumerate(lines):
+            yield wrap(key_of(line)), index, position, line
+
+    merged = merge(*[decorated(index, x) for index, x in enumerate(runs[first:])])
+    return ((key.key if reverse else key, line) for key, _, _, line in merged)
+
+
+def _sort_run(key_of, reverse, lines):
+
+    """
+    Returns (key, line) tuples for 'lines', stably sorted by key.
+    """
+
+    run = [(key_of(x), x) for x in lines]
+    run.sort(key=lambda x: x[0], reverse=reverse)
+    return run
+
+
+def _write_run(run, line_end, binary, runfile=None):
+
+    """
+    Writes the lines of the sorted (key, line) tuples in 'run' to
+    'runfile' (by default a new temporary file) and returns it, rewound.
+    """
+
+    if runfile is None:
+        runfile = tempfile.TemporaryFile('w+b')
+        if not binary:
+            runfile = io.TextIOWrapper(runfile, encoding='utf-8', newline='')
+    join = b''.join if binary else u''.join
+    for start in range(0, len(run), 1000):
+        runfile.write(join(line + line_end for _, line in run[start:start + 1000]))
+    runfile.seek(0)
+    return runfile
+
+
+def _open_run(path, binary):
+
+    """
+    Opens a run file written by a worker process.
+    """
+
+    if binary:
+        return open(path, 'rb')
+    return io.open(path, encoding='utf-8', newline='')
+
+
+def _close_runs(runs):
+
+    """
+    Closes the run files in 'runs' and deletes those written by worker
+    processes (temporary files are deleted when they are closed).
+    """
+
+    for runfile in runs:
+        runfile.close()
+        name = getattr(runfile, 'name', None)
+        if isinstance(name, string_types) and os.path.exists(name):
+            os.remove(name)
+
+
+def _init_worker(schema, keys, binary, convert, reverse, line_end):
+
+    """
+    Builds the key function used by this worker process.
+    """
+
+    fw = FixedWidth(schema)
+    _worker['key_of'] = _key_function(fw.layout, keys, binary, convert)
+    _worker['binary'] = binary
+    _worker['reverse'] = reverse
+    _worker['line_end'] = line_end
+
+
+def _sort_run_worker(lines):
+
+    """
+    Sorts a run of lines, writes it to a new temporary file and returns
+    the file's path, for the caller to open and remove.
+    """
+
+    binary = _worker['binary']
+    fd, path = tempfile.mkstemp(suffix='.run')
+    if binary:
+        runfile = io.open(fd, 'w+b')
+    else:
+        runfile = io.open(fd, 'w+', encoding='utf-8', newline='')
+    with runfile:
+        _write_run(_sort_run(_worker['key_of'], _worker['reverse'], lines),
+                   _worker['line_end'], binary, runfile)
+    return path
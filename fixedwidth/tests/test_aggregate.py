@@ -0,0 +1,67 @@
+"""
+Tests for the aggregate function.
+"""
+import io
+import unittest
+from decimal import Decimal
+
+from fixedwidth.aggregate import aggregate
+from fixedwidth.fixedwidth import FixedWidth
+from fixedwidth.tests.test_multi import field
+
+CONFIG = {
+    'branch': field('string', 1, 3),
+    'account': field('integer', 4, 4),
+    'amount': field('decimal', 8, 8, precision=2),
+    'fee': field('decimal', 16, 5, precision=2, required=False, default=None),
+}
+
+TEXT = (
+    "NY 000100012.50 0.10\n"
+    "LA 000200100.25     \n"
+    "NY 000300001.00 1.00\n"
+    "NY  00400002.25     \n"
+)
+
+
+class TestAggregate(unittest.TestCase):
+    """
+    Test of single-pass totals.
+    """
+
+    def setUp(self):
+        self.fw_obj = FixedWidth(CONFIG, line_end='\n')
+
+    def test_totals(self):
+        for data in (io.StringIO(TEXT), io.BytesIO(TEXT.encode('ascii'))):
+            result = aggregate(self.fw_obj, data, sums=['amount', 'fee'],
+                               minimums=['account'], maximums=['amount'], chunk_size=9)
+            self.assertEqual(result.count, 4)
+            self.assertEqual(result.sums, {'amount': Decimal('116.00'), 'fee': Decimal('1.10')})
+            self.assertEqual(result.minimums, {'account': 1})
+            self.assertEqual(result.maximums, {'amount': Decimal('100.25')})
+
+        result = aggregate(self.fw_obj, io.StringIO(''), sums=['amount'], maximums=['fee'])
+        self.assertEqual(result, (0, {'amount': 0}, {}, {'fee': None}))
+
+    def test_group_by(self):
+        result = aggregate(self.fw_obj, io.StringIO(TEXT), sums=['amount'],
+                           maximums=['fee'], group_by='branch')
+        self.assertEqual(sorted(result), ['LA', 'NY'])
+        self.assertEqual(result['NY'].count, 3)
+        self.assertEqual(result['NY'].sums['amount'], Decimal('15.75'))
+        self.assertEqual(result['LA'].maximums['fee'], None)
+
+        # raw slices ' 004' and '0004' are the same account
+        text = TEXT.replace("NY  004", "NY 0001")
+        result = aggregate(self.fw_obj, io.StringIO(text), sums=['amount'],
+                           group_by=['branch', 'account'])
+        self.assertEqual(result['NY', 1].count, 2)
+        self.assertEqual(result['NY', 1].sums['amount'], Decimal('14.75'))
+
+    def test_unknown_field(self):
+        self.assertRaises(ValueError, aggregate, self.fw_obj, io.StringIO(TEXT), sums=['tax'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+"""
+Tests for asyncio streaming.
+"""
+import asyncio
+import unittest
+from copy import deepcopy
+from decimal import Decimal
+
+from fixedwidth.fixedwidth import FixedWidth
+from fixedwidth import aio
+from fixedwidth.tests.test_core import SAMPLE_CONFIG
+from fixedwidth.tests.test_parallel import LINE
+
+
+class Writer(object):
+    """
+    Collects what is written, like an asyncio.StreamWriter.
+    """
+
+    def __init__(self):
+        self.blocks = []
+        self.drains = 0
+
+    def write(self, data):
+        self.blocks.append(data)
+
+    async def drain(self):
+        self.drains += 1
+
+
+class TestAio(unittest.TestCase):
+    """
+    Test of aio.iter_records and aio.write_records.
+    """
+
+    def setUp(self):
+        self.fw_obj = FixedWidth(deepcopy(SAMPLE_CONFIG))
+
+    def read(self, data, **kwargs):
+        async def collect():
+            reader = asyncio.StreamReader()
+            reader.feed_data(data)
+            reader.feed_eof()
+            return [x async for x in aio.iter_records(self.fw_obj, reader, **kwargs)]
+        return asyncio.run(collect())
+
+    def test_iter_records(self):
+        """
+        Parse records read from a stream, inline or in an executor.
+        """
+
+        lines = [LINE.replace('032', '%03d' % x) for x in range(30)]
+        data = '\r\n'.join(lines).encode('ascii')
+
+        records = self.read(data, chunk_size=100)
+        self.assertEqual([x['age'] for x in records], list(range(30)))
+        records = self.read(data, chunk_size=1000, offload=True, fields=['latitude'])
+        self.assertEqual(records[-1], {'latitude': Decimal('40.7128')})
+
+        # LF line ends with the default CRLF line_end are never split
+        data = '\n'.join(lines).encode('ascii')
+        self.assertRaises(ValueError, self.read, data, chunk_size=100)
+
+    def test_write_records(self):
+        """
+        Write sync and async iterables of records to a stream.
+        """
+
+        record = self.fw_obj.layout.parse(LINE)
+
+        async def generate():
+            for _ in range(5):
+                yield record
+
+        writer = Writer()
+        count = asyncio.run(aio.write_records(
+            self.fw_obj, generate(), writer, buffer_size=300, offload=True))
+        self.assertEqual(count, 5)
+        self.assertEqual(b''.join(writer.blocks), (LINE + '\r\n').encode('ascii') * 5)
+        self.assertEqual(writer.drains, 3)
+
+        writer = Writer()
+        asyncio.run(aio.write_records(self.fw_obj, [record] * 2, writer))
+        self.assertEqual(len(writer.blocks), 1)
+        self.assertEqual(self.read(writer.blocks[0]), [record] * 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+"""
+Tests for the fixedwidth command.
+"""
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from fixedwidth.cli import main
+from fixedwidth.tests.test_multi import field
+
+CONFIG = {
+    'name': field('string', 1, 10),
+    'amount': field('decimal', 11, 8, precision=2),
+    'day': field('date', 19, 8, format='%Y%m%d', required=False, default=None,
+                 padding=' '),
+    'kind': field('string', 27, 1, value='D'),
+}
+
+TEXT = (
+    "Ann       00012.5020170101D\r\n"
+    "Bob       00100.25        D\r\n"
+)
+
+
+class TestCli(unittest.TestCase):
+    """
+    Test of conversion to and from CSV and JSON Lines.
+    """
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.layout = self.path('layout.json')
+        with open(self.layout, 'w') as outfile:
+            json.dump(CONFIG, outfile)
+        self.input = self.path('input.txt')
+        with open(self.input, 'wb') as outfile:
+            outfile.write(TEXT.encode('ascii'))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def path(self, name):
+        return os.path.join(self.tmpdir, name)
+
+    def read(self, name):
+        with io.open(self.path(name), newline='') as infile:
+            return infile.read()
+
+    def test_csv(self):
+        main(['export', self.layout, self.input, self.path('out.csv'), '--quiet'])
+        self.assertEqual(self.read('out.csv'), (
+            "name,amount,day,kind\r\n"
+            "Ann,12.50,20170101,D\r\n"
+            "Bob,100.25,,D\r\n"
+        ))
+        main(['import', self.layout, self.path('out.csv'), self.path('out.txt'), '--quiet'])
+        self.assertEqual(self.read('out.txt'), TEXT)
+
+    def test_jsonl(self):
+        main(['export', self.layout, self.input, self.path('out.jsonl'), '--format', 'jsonl',
+              '--fields', 'amount', 'name', '--workers', '2', '--quiet'])
+        lines = [json.loads(x) for x in self.read('out.jsonl').splitlines()]
+        self.assertEqual(lines[1], {'amount': '100.25', 'name': 'Bob'})
+
+        with open(self.path('in.jsonl'), 'w') as outfile:
+            outfile.write('{"name": "Ann", "amount": 12.5, "day": "20170101"}\n'
+                          '{"name": "Bob", "amount": "100.25", "day": null}\n')
+        main(['import', self.layout, self.path('in.jsonl'), self.path('out.txt'),
+              '--format', 'jsonl', '--line-end', '\\n', '--quiet'])
+        self.assertEqual(self.read('out.txt'), TEXT.replace('\r\n', '\n'))
+
+    def test_decimal_default(self):
+        config = dict(CONFIG, fee=field('decimal', 28, 8, precision=2, required=False))
+        config['fee']['default'] = 0.1
+        with open(self.layout, 'w') as outfile:
+            json.dump(config, outfile)
+        with open(self.path('in.csv'), 'w') as outfile:
+            outfile.write("name,amount\nAnn,12.50\n")
+        main(['import', self.layout, self.path('in.csv'), self.path('out.txt'), '--quiet'])
+        self.assertEqual(self.read('out.txt'), "Ann       00012.50        D00000.10\r\n")
+
+    def test_bad_records(self):
+        stderr = sys.stderr
+        sys.stderr = io.StringIO()
+        try:
+            with open(self.path('in.csv'), 'w') as outfile:
+                outfile.write("name,amount\nAnn,12.50\nBob,lots\n")
+            with self.assertRaises(SystemExit) as context:
+                main(['import', self.layout, self.path('in.csv'), self.path('out.txt')])
+            self.assertEqual(context.exception.code, 1)
+            self.assertIn("in.csv line 3: ", sys.stderr.getvalue())
+
+            with open(self.input, 'ab') as outfile:
+                outfile.write(b"Cy        0001x.5020170101D\r\n")
+            self.assertRaises(SystemExit, main, ['export', self.layout, self.input,
+                                                 self.path('out.csv')])
+            self.assertIn("input.txt line 3: ", sys.stderr.getvalue())
+        finally:
+            sys.stderr = stderr
+
+    def test_errors(self):
+        self.assertRaises(SystemExit, main, ['export', self.layout, self.input,
+                                             self.path('out.csv'), '--fields', 'tax'])
+        self.assertRaises(SystemExit, main, ['import', self.layout, self.input,
+                                             self.path('out.txt'), '--workers', '2'])
+
+
+if __name__ == '__main__':
+    unittest.main()
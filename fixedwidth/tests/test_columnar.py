@@ -0,0 +1,69 @@
+"""
+Tests for columnar decoding.
+"""
+import unittest
+from copy import deepcopy
+
+from fixedwidth.fixedwidth import FixedWidth
+from fixedwidth import columnar
+from fixedwidth.tests.test_core import SAMPLE_CONFIG
+from fixedwidth.tests.test_parallel import LINE
+
+
+@unittest.skipIf(columnar.numpy is None, "numpy is not installed")
+class TestColumnar(unittest.TestCase):
+    """
+    Test of columnar.decode_columns.
+    """
+
+    def test_decode_columns(self):
+        """
+        Decode every column of a buffer.
+        """
+
+        numpy = columnar.numpy
+        fw_obj = FixedWidth(deepcopy(SAMPLE_CONFIG))
+        lines = [LINE.replace('032', '%03d' % x) for x in range(5)]
+        lines[1] = lines[1][:93] + ' ' * 7 + lines[1][100:]
+        data = '\r\n'.join(lines).encode('ascii')
+
+        columns = columnar.decode_columns(fw_obj, data)
+        self.assertEqual(list(columns), [x[1] for x in fw_obj.ordered_fields])
+        self.assertEqual(columns['first_name'].tolist(), ['Michael'] * 5)
+        self.assertEqual(columns['age'].tolist(), [0, 1, 2, 3, 4])
+        self.assertEqual(columns['age'].dtype, numpy.int64)
+        self.assertEqual(columns['latitude'][0], 40.7128)
+        self.assertEqual(columns['temperature'].tolist(), [98.6] * 5)
+        self.assertEqual(str(columns['date'][0]), '2017-01-01T00:00:00.000000')
+        self.assertTrue(numpy.isnat(columns['none_date']).all())
+
+    def test_fields(self):
+        """
+        Decode only the requested columns.
+        """
+
+        fw_obj = FixedWidth(deepcopy(SAMPLE_CONFIG))
+        data = ((LINE + '\r\n') * 3).encode('ascii')
+        columns = columnar.decode_columns(fw_obj, data, fields=['elevation'])
+        self.assertEqual(dict(columns)['elevation'].tolist(), [-100] * 3)
+        self.assertEqual(len(columns), 1)
+
+    def test_ebcdic(self):
+        """
+        Decode packed fields and EBCDIC numbers.
+        """
+
+        config = {
+            "count": {"required": True, "type": "integer", "start_pos": 1, "length": 3,
+                      "alignment": "right", "padding": "0"},
+            "amount": {"required": True, "type": "packed", "precision": 2,
+                       "start_pos": 4, "length": 3, "alignment": "right", "padding": " "},
+        }
+        fw_obj = FixedWidth(config, encoding="cp037", line_end="")
+        data = u"012".encode("cp037") + b"\x01\x23\x4d" + u"007".encode("cp037") + b"\x00\x00\x5c"
+        columns = columnar.decode_columns(fw_obj, data)
+        self.assertEqual(columns["count"].tolist(), [12, 7])
+        self.assertEqual(columns["amount"].tolist(), [-12.34, 0.05])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,9 +3,13 @@
 """
 Tests for the FixedWidth class.
 """
+import io
+import os
+import tempfile
+import threading
 import unittest
 from decimal import Decimal, ROUND_UP
-from copy import deepcopy
+from copy import copy, deepcopy
 import sys
 sys.path.append("..")
 
@@ -15,6 +19,7 @@ try:
     from fixedwidth import FixedWidth
 except ImportError:
     from fixedwidth.fixedwidth import FixedWidth
+from fixedwidth.fixedwidth import Record, Schema, Stats
 
 SAMPLE_CONFIG = {
 
@@ -259,5 +264,505 @@ class TestFixedWidth(unittest.TestCase):
 
         self.assertEqual(fw_obj.data["decimal_precision"], Decimal(1))
 
+    def test_layout(self):
+        """
+        The compiled layout parses into a new dict and builds the same line.
+        """
+
+        fw_config = deepcopy(SAMPLE_CONFIG)
+        fw_obj = FixedWidth(fw_config)
+        line = (
+            "Michael   Smith                              "
+            "032vegetarian             40.7128   -74.0059-100   98.6201701011.000        "
+        )
+
+        layout = fw_obj.layout
+        self.assertEqual(layout.record_length, 121)
+        values = layout.parse(line)
+        self.assertIsNot(values, layout.parse(line))
+        self.assertEqual(values["age"], 32)
+        self.assertEqual(values["date"], datetime.datetime(2017, 1, 1))
+        self.assertEqual(layout.render(values), line)
+
+    def test_iter_records(self):
+        """
+        Stream records from text and binary files in small chunks.
+        """
+
+        line = (
+            "Michael   Smith                              "
+            "032vegetarian             40.7128   -74.0059-100   98.6201701011.000        "
+        )
+        fw_obj = FixedWidth(deepcopy(SAMPLE_CONFIG))
+        fw_obj.update(first_name="unchanged")
+
+        # the final line has no line end
+        text = line + "\r\n" + line.replace("Michael", "Ann    ")
+        records = list(fw_obj.iter_records(io.StringIO(text), chunk_size=50))
+        self.assertEqual([x["first_name"] for x in records], ["Michael", "Ann"])
+        self.assertIsNot(records[0], records[1])
+        self.assertEqual(fw_obj.data, {"first_name": "unchanged"})
+
+        data = (line + "\r\n").encode("ascii") * 3
+        records = list(fw_obj.iter_records(io.BytesIO(data), chunk_size=7))
+        self.assertEqual(len(records), 3)
+        self.assertEqual(records[2]["longitude"], Decimal('-74.0059'))
+
+        records = fw_obj.iter_records(io.BytesIO(data), fields=["age", "date"])
+        self.assertEqual(
+            next(records), {"age": 32, "date": datetime.datetime(2017, 1, 1)})
+
+        # lines longer than the layout, such as ones with trailing filler
+        data = (line + "FILLERFILLER\r\n").encode("ascii") * 3
+        for chunk_size in (7, 16, 33, 1024):
+            records = list(fw_obj.iter_records(io.BytesIO(data), chunk_size=chunk_size))
+            self.assertEqual([x["age"] for x in records], [32] * 3)
+
+        # universal newlines turn CRLF into LF, so no line end is ever found
+        translated = io.StringIO((line + "\r\n") * 20, newline=None)
+        self.assertRaises(ValueError, list, fw_obj.iter_records(translated, chunk_size=50))
+
+    def test_iter_records_fixed_length(self):
+        """
+        Without a line end, records are split on the record length.
+        """
+
+        line = (
+            "Michael   Smith                              "
+            "032vegetarian             40.7128   -74.0059-100   98.6201701011.000        "
+        )
+        fw_obj = FixedWidth(deepcopy(SAMPLE_CONFIG), line_end='')
+        records = list(fw_obj.iter_records(io.StringIO(line * 4), chunk_size=100))
+        self.assertEqual(len(records), 4)
+        self.assertEqual(records[3]["age"], 32)
+
+    def test_write_records(self):
+        """
+        Write many records without modifying them or self.data.
+        """
+
+        fw_obj = FixedWidth(deepcopy(SAMPLE_CONFIG))
+        record = dict(
+            last_name="Smith", first_name="Michael",
+            age=32, meal="vegetarian", latitude=Decimal('40.7128'),
+            longitude=Decimal('-74.0059'), elevation=-100, decimal_precision=Decimal('1.0001'),
+        )
+        good = (
+            "Michael   Smith                              "
+            "032vegetarian             40.7128   -74.0059-100   98.6201701011.001        \r\n"
+        )
+
+        output = io.StringIO()
+        count = fw_obj.write_records([record] * 3, output, buffer_size=200)
+        self.assertEqual(count, 3)
+        self.assertEqual(output.getvalue(), good * 3)
+        self.assertNotIn("temperature", record)
+        self.assertEqual(fw_obj.data, {})
+
+        output = io.BytesIO()
+        fw_obj.write_records([record], output)
+        self.assertEqual(output.getvalue(), good.encode("ascii"))
+
+        record["elevation"] = None
+        self.assertRaises(ValueError, fw_obj.write_records, [record], io.StringIO())
+
+    def test_date_formats(self):
+        """
+        Numeric date formats are sliced; others still use strptime.
+        """
+
+        config = {
+            "ymd": {"required": True, "type": "date", "format": "%y%m%d",
+                    "start_pos": 1, "length": 6, "alignment": "left", "padding": " "},
+            "mdy": {"required": True, "type": "date", "format": "%m/%d/%Y",
+                    "start_pos": 7, "length": 10, "alignment": "left", "padding": " "},
+            "text": {"required": True, "type": "date", "format": "%d %b",
+                     "start_pos": 17, "length": 6, "alignment": "left", "padding": " "},
+        }
+        fw_obj = FixedWidth(config, date_cache_size=2)
+        for line in ("68123112/31/196901 Jan", "69010102/03/200405 Feb"):
+            fw_obj.line = line
+            self.assertEqual(fw_obj.line, line + "\r\n")
+            for field_name, parameters in fw_obj.config.items():
+                expected = datetime.datetime.strptime(
+                    line[parameters["start_pos"] - 1:parameters["end_pos"]],
+                    parameters["format"])
+                self.assertEqual(fw_obj.data[field_name], expected)
+
+        # the cache is bounded to two entries
+        fw_obj.line = "70010102/03/200405 Feb"
+        self.assertEqual(len(fw_obj.layout.parse_plan[0][3].cache), 1)
+        with self.assertRaises(ValueError):
+            fw_obj.line = "69130102/03/200405 Feb"
+
+    def test_fixed_point(self):
+        """
+        Fixed-point decimals round-trip with an implied decimal point.
+        """
+
+        config = {
+            "amount": {"required": True, "type": "decimal", "precision": 2,
+                       "start_pos": 1, "length": 10, "alignment": "right", "padding": " "},
+            "rate": {"required": True, "type": "decimal", "precision": 9,
+                     "start_pos": 11, "length": 12, "alignment": "right", "padding": " "},
+        }
+        fw_obj = FixedWidth(config, fixed_point=True)
+        fw_obj.update(amount=Decimal("-1234.567"), rate=Decimal("0.0000001"))
+        self.assertEqual(fw_obj.line, "   -123457  0000000100\r\n")
+
+        fw_obj.line = "    123456  0000000100"
+        self.assertEqual(fw_obj.data["amount"], Decimal("1234.56"))
+        self.assertEqual(str(fw_obj.data["amount"]), "1234.56")
+        self.assertEqual(fw_obj.data["rate"], Decimal("0.0000001"))
+
+    def test_bytes(self):
+        """
+        Parse and write bytes in an EBCDIC encoding.
+        """
+
+        config = {
+            "name": {"required": True, "type": "string", "start_pos": 1, "length": 6,
+                     "alignment": "left", "padding": " "},
+            "count": {"required": True, "type": "integer", "start_pos": 7, "length": 4,
+                      "alignment": "right", "padding": "0"},
+            "amount": {"required": False, "type": "decimal", "default": "1.5",
+                       "start_pos": 11, "length": 6, "alignment": "right", "padding": " "},
+        }
+        fw_obj = FixedWidth(config, encoding="cp037")
+        line = u"Zo\u00eb   0042      ".encode("cp037")
+        self.assertEqual(
+            fw_obj.layout.parse(line),
+            {"name": u"Zo\u00eb", "count": 42, "amount": Decimal("1.5")})
+
+        output = io.BytesIO()
+        fw_obj.write_records([{"name": u"abc", "count": 7, "amount": Decimal("2.25")}], output)
+        self.assertEqual(output.getvalue(), u"abc   0007  2.25\r\n".encode("cp037"))
+        self.assertEqual(
+            list(fw_obj.iter_records(io.BytesIO(output.getvalue()), fields=["amount"])),
+            [{"amount": Decimal("2.25")}])
+
+        fw_obj = FixedWidth(deepcopy(config), encoding="utf-8")
+        self.assertEqual(fw_obj.layout.parse(b"abc   0042   1.5")["count"], 42)
+        self.assertRaises(
+            ValueError, fw_obj.write_records, [{"name": u"Zo\u00eb", "count": 1}], io.BytesIO())
+
+    def test_packed_and_zoned(self):
+        """
+        Packed (COMP-3) and zoned decimal fields round-trip as bytes.
+        """
+
+        config = {
+            "packed": {"required": True, "type": "packed", "precision": 2,
+                       "start_pos": 1, "length": 4, "alignment": "right", "padding": " "},
+            "zoned": {"required": True, "type": "zoned", "precision": 2,
+                      "start_pos": 5, "length": 6, "alignment": "right", "padding": "0"},
+            "optional": {"required": False, "type": "packed", "default": 0,
+                         "start_pos": 11, "length": 2, "alignment": "right", "padding": " "},
+        }
+        for encoding in ("cp037", "latin-1"):
+            fw_obj = FixedWidth(deepcopy(config), encoding=encoding, line_end="")
+            output = io.BytesIO()
+            fw_obj.write_records([
+                {"packed": Decimal("-12345.67"), "zoned": Decimal("-123.45"),
+                 "optional": 12},
+                {"packed": Decimal("0.5"), "zoned": Decimal("10")},
+            ], output)
+            data = output.getvalue()
+            self.assertEqual(data[:4], b"\x12\x34\x56\x7d")
+            self.assertEqual(data[4:10], u"01234N".encode(encoding))
+            self.assertEqual(data[10:12], b"\x01\x2c")
+            self.assertEqual(data[14:16], b"\x05\x0c")
+            self.assertEqual(data[16:22], u"00100{".encode(encoding))
+
+            records = list(fw_obj.iter_records(io.BytesIO(data)))
+            self.assertEqual(records[0], {
+                "packed": Decimal("-12345.67"), "zoned": Decimal("-123.45"),
+                "optional": Decimal("12")})
+            self.assertEqual(records[1]["packed"], Decimal("0.50"))
+            self.assertEqual(records[1]["zoned"], Decimal("10.00"))
+            self.assertEqual(records[1]["optional"], Decimal("0"))
+
+            # text lines hold the packed bytes as characters
+            fw_obj.line = data[:12].decode(encoding)
+            self.assertEqual(fw_obj.data["packed"], Decimal("-12345.67"))
+
+        fw_obj = FixedWidth(deepcopy(config), encoding="cp037")
+        zero = b"\x00\x00\x00\x0c" + u"00000{".encode("cp037")
+        self.assertEqual(fw_obj.layout.parse(zero + b"\x00\x00")["optional"], 0)
+        self.assertEqual(fw_obj.layout.parse(zero + b"\x40\x40")["optional"], 0)
+        self.assertRaises(ValueError, fw_obj.layout.parse, b"\x40" * 4 + zero[4:] + b"\x00\x00")
+        self.assertRaises(ValueError, FixedWidth, deepcopy(config), encoding="ascii")
+
+    def test_schema(self):
+        """
+        Equal configs share one validated, cached Schema.
+        """
+
+        fw_config = deepcopy(SAMPLE_CONFIG)
+        fw_obj = FixedWidth(fw_config)
+        self.assertEqual(fw_config, SAMPLE_CONFIG)
+        self.assertEqual(fw_obj.config["nickname"]["end_pos"], 45)
+        self.assertEqual(fw_obj.config, Schema(SAMPLE_CONFIG).config)
+        with self.assertRaises(TypeError):
+            fw_obj.config["nickname"]["padding"] = "X"
+        with self.assertRaises(TypeError):
+            fw_obj.config["nickname"] = {}
+
+        other = FixedWidth(deepcopy(SAMPLE_CONFIG), first_name="Ann")
+        self.assertIs(other.schema, fw_obj.schema)
+        self.assertIs(other.layout, fw_obj.layout)
+        self.assertIsNot(FixedWidth(fw_config, line_end="\n").schema, fw_obj.schema)
+
+        schema = Schema.get(SAMPLE_CONFIG, line_end="\n")
+        self.assertEqual(len(set([schema, Schema(SAMPLE_CONFIG, line_end="\n")])), 1)
+        self.assertRaises(AttributeError, setattr, schema, "layout", None)
+        self.assertEqual(FixedWidth(schema).line_end, "\n")
+        self.assertRaises(ValueError, FixedWidth, schema, line_end="\r\n")
+        self.assertRaises(TypeError, Schema, SAMPLE_CONFIG, bogus=True)
+
+    def test_schema_save(self):
+        """
+        Save a Schema and load it again.
+        """
+
+        schema = Schema(SAMPLE_CONFIG, fixed_point=True)
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            schema.save(path)
+            loaded = Schema.load(path)
+        finally:
+            os.remove(path)
+        self.assertEqual(loaded, schema)
+        self.assertEqual(loaded.config, schema.config)
+        self.assertTrue(FixedWidth(loaded).fixed_point)
+        self.assertIs(Schema.get(SAMPLE_CONFIG, fixed_point=True), loaded)
+        self.assertIs(FixedWidth(deepcopy(SAMPLE_CONFIG), fixed_point=True).schema, loaded)
+
+    def test_validate_records(self):
+        """
+        Collect every error in a batch of records.
+        """
+
+        fw_obj = FixedWidth(deepcopy(SAMPLE_CONFIG))
+        good = dict(
+            last_name="Smith", first_name="Michael",
+            age=32, meal="vegetarian", latitude=Decimal('40.7128'),
+            longitude=Decimal('-74.0059'), elevation=-100,
+        )
+        bad = dict(good, first_name="Bartholomew", age="32")
+        del bad["elevation"]
+
+        report = fw_obj.validate_records([good, bad, good, bad])
+        self.assertEqual([(x.line, x.field) for x in report], [
+            (2, "first_name"), (2, "age"), (2, "elevation"),
+            (4, "first_name"), (4, "age"), (4, "elevation"),
+        ])
+        self.assertEqual(report[0].reason, "first_name is too long (limited to 10 characters).")
+        self.assertNotIn("temperature", good)
+        self.assertEqual(len(fw_obj.validate_records([bad] * 5, max_errors=4)), 4)
+
+    def test_validate_file(self):
+        """
+        Collect every error in a file.
+        """
+
+        config = {
+            "kind": {"required": True, "type": "string", "value": "D", "start_pos": 1,
+                     "length": 1, "alignment": "left", "padding": " "},
+            "count": {"required": True, "type": "integer", "start_pos": 2, "length": 3,
+                      "alignment": "right", "padding": "0"},
+            "day": {"required": False, "type": "date", "format": "%Y%m%d", "default": None,
+                    "start_pos": 5, "length": 8, "alignment": "left", "padding": " "},
+        }
+        fw_obj = FixedWidth(config, line_end="\n")
+        data = "D00120170101\nH   20171301\nD002        \nD003\n"
+
+        report = fw_obj.validate_file(io.StringIO(data))
+        self.assertEqual([(x.line, x.field) for x in report], [
+            (2, "kind"), (2, "count"), (2, "day"), (4, None),
+        ])
+        self.assertEqual(report[1].reason, "Field count is required, but was not provided.")
+        self.assertEqual(fw_obj.validate_file(io.BytesIO(data.encode("ascii")), max_errors=2),
+                         report[:2])
+
+        report = fw_obj.validate_file(io.StringIO("D00120170101FILLER\n" * 3), chunk_size=5)
+        self.assertEqual([(x.line, x.field) for x in report], [(1, None), (2, None), (3, None)])
+        self.assertEqual(report[0].reason, "Line is 18 characters; should be 12.")
+
+    def test_lazy_records(self):
+        """
+        Lazy records convert fields on access and copy unchanged lines.
+        """
+
+        line = (
+            "Michael   Smith                              "
+            "032vegetarian             40.7128   -74.0059-100   98.6201701011.000        "
+        )
+        fw_obj = FixedWidth(deepcopy(SAMPLE_CONFIG))
+        text = line + "\r\n" + line.replace("Michael", "Ann    ")
+        records = list(fw_obj.iter_records(io.StringIO(text), lazy=True))
+        self.assertIsInstance(records[0], Record)
+        self.assertEqual(records[0].age, 32)
+        self.assertEqual(records[1]["first_name"], "Ann")
+        self.assertEqual(records[0].to_dict(), fw_obj.layout.parse(line))
+        self.assertRaises(AttributeError, getattr, records[0], "missing")
+        self.assertFalse(hasattr(records[0], "__dict__"))
+
+        records[1]["age"] = 45
+        output = io.BytesIO()
+        fw_obj.write_records(records, output)
+        self.assertEqual(output.getvalue().decode("ascii"),
+                         line + "\r\n" + line.replace("Michael", "Ann    ")
+                         .replace("032", "045") + "\r\n")
+        self.assertRaises(KeyError, records[0].__setitem__, "missing", 1)
+
+        record = next(fw_obj.iter_records(io.BytesIO(line.encode("ascii")),
+                                          fields=["age"], lazy=True))
+        self.assertEqual(dict(record), {"age": 32})
+        self.assertEqual(record.render(), line)
+
+        # changing a projected record keeps the fields it does not expose
+        hot = line.replace(" 98.6", " 99.1")
+        record = next(fw_obj.iter_records(io.StringIO(hot), fields=["age"], lazy=True))
+        record["age"] = 45
+        self.assertEqual(record.render(), hot.replace("032", "045"))
+        self.assertEqual(record.render(binary=True), hot.replace("032", "045").encode("ascii"))
+        record["age"] = 1000
+        self.assertRaises(ValueError, record.render)
+
+        # copies are independent, and deep copies can be made
+        record["age"] = 45
+        duplicate = copy(record)
+        duplicate["age"] = 46
+        self.assertEqual((record.age, duplicate.age), (45, 46))
+        self.assertEqual(deepcopy(record).render(), hot.replace("032", "045"))
+
+    def test_instrument(self):
+        """
+        Time field conversions and lines of an instrumented object only.
+        """
+
+        line = (
+            "Michael   Smith                              "
+            "032vegetarian             40.7128   -74.0059-100   98.6201701011.000        "
+        )
+        fw_obj = FixedWidth(deepcopy(SAMPLE_CONFIG))
+        calls = []
+        stats = fw_obj.instrument(Stats(callback=lambda *args: calls.append(args)))
+        self.assertIsNot(fw_obj.layout, FixedWidth(deepcopy(SAMPLE_CONFIG)).layout)
+
+        data = (line + "\r\n") * 3
+        records = list(fw_obj.iter_records(io.StringIO(data)))
+        self.assertEqual(records[0], FixedWidth(deepcopy(SAMPLE_CONFIG)).layout.parse(line))
+        fw_obj.write_records(records, io.StringIO())
+
+        rows = dict(((x.operation, x.field), x) for x in stats.field_stats())
+        self.assertEqual(rows["parse", "age"].count, 3)
+        self.assertEqual(rows["parse", "age"].type, "integer")
+        self.assertEqual(rows["format", "date"].count, 3)
+        self.assertEqual(stats.totals["parse"][:2], [3, 3 * len(line)])
+        self.assertEqual(stats.totals["emit"][:2], [3, 3 * len(line)])
+        self.assertTrue(all(x > 0 for x in stats.rate("parse")))
+        types = dict(((x.operation, x.type), x.count) for x in stats.type_stats())
+        self.assertEqual(types["parse", "decimal"], 12)
+
+        self.assertRaises(ValueError, fw_obj.layout.parse, line.replace("032", "0x2"))
+        rows = stats.field_stats()
+        self.assertGreaterEqual(rows[0].seconds, rows[-1].seconds)
+        rows = dict(((x.operation, x.field), x) for x in rows)
+        self.assertEqual(rows["parse", "age"].failures, 1)
+        self.assertIs(calls[-1][4].__class__, ValueError)
+
+        fw_obj.data = dict(records[0])
+        self.assertIs(fw_obj.is_valid, True)
+        self.assertEqual(fw_obj.validate_records(records), [])
+        # validation is counted apart from emitted lines
+        self.assertEqual(stats.totals["emit"][0], 3)
+        self.assertEqual(stats.totals["validate"][:2], [4, 4 * len(line)])
+        fw_obj.uninstrument()
+        self.assertIs(fw_obj.is_valid, True)
+        fw_obj.instrument(stats)
+
+        stats.reset()
+        fw_obj.line = line
+        self.assertEqual(stats.totals["parse"][0], 1)
+        fw_obj.uninstrument()
+        fw_obj.line = line
+        self.assertEqual(stats.totals["parse"][0], 1)
+
+    def test_templated(self):
+        """
+        Render only the variable fields into a pre-rendered template.
+        """
+
+        config = deepcopy(SAMPLE_CONFIG)
+        config["meal"]["value"] = "100% veg"
+        fw_obj = FixedWidth(config)
+        record = dict(
+            last_name="Smith", first_name="Michael", age=32, latitude=Decimal('40.7128'),
+            longitude=Decimal('-74.0059'), elevation=-100,
+        )
+        fields = ["last_name", "first_name", "age", "latitude", "longitude", "elevation"]
+        render = fw_obj.layout.templated(fields)
+        self.assertEqual(render(record), fw_obj.layout.render(record))
+        self.assertIn("100% veg", render(record))
+        self.assertEqual(fw_obj.layout.templated(fields, binary=True)(record),
+                         fw_obj.layout.render_bytes(record))
+        # constant fields may be given, but only with their constant value
+        self.assertEqual(render(dict(record, meal="100% veg", temperature=None,
+                                     decimal_precision=Decimal(1))), render(record))
+        self.assertRaises(ValueError, render, dict(record, meal="other"))
+        self.assertRaises(ValueError, render, dict(record, age="32"))
+        self.assertRaises(ValueError, fw_obj.write_records,
+                          [dict(record, temperature=Decimal("99.1"))], io.StringIO(),
+                          fields=fields)
+
+        output = io.StringIO()
+        fw_obj.write_records([record] * 2, output, fields=fields)
+        self.assertEqual(output.getvalue(), (fw_obj.layout.render(record) + "\r\n") * 2)
+
+        self.assertRaises(ValueError, fw_obj.layout.templated, fields[1:])
+        self.assertRaises(ValueError, fw_obj.layout.templated, ["missing"])
+
+    def test_parse_and_build(self):
+        """
+        Parse and build without state, from several threads at once.
+        """
+
+        line = (
+            "Michael   Smith                              "
+            "032vegetarian             40.7128   -74.0059-100   98.6201701011.000        "
+        )
+        fw_obj = FixedWidth(deepcopy(SAMPLE_CONFIG), date_cache_size=3)
+        record = fw_obj.parse(line)
+        self.assertEqual(record["age"], 32)
+        self.assertEqual(fw_obj.parse(line.encode("ascii"), fields=["age"]), {"age": 32})
+        self.assertEqual(fw_obj.build(record), line + "\r\n")
+        self.assertEqual(fw_obj.data, {})
+
+        partial_record = dict(record)
+        del partial_record["temperature"]
+        fw_obj.build(partial_record)
+        self.assertNotIn("temperature", partial_record)
+
+        failures = []
+
+        def work(number):
+            for day in range(1, 29):
+                text = line.replace("032", "%03d" % number).replace("20170101", "201702%02d" % day)
+                parsed = fw_obj.parse(text)
+                if parsed["age"] != number or parsed["date"].day != day \
+                        or fw_obj.build(parsed) != text + "\r\n":
+                    failures.append((number, day))
+
+        threads = [threading.Thread(target=work, args=(x,)) for x in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(failures, [])
+        self.assertEqual(fw_obj.data, {})
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,70 @@
+"""
+Tests for the diff function.
+"""
+import io
+import unittest
+from decimal import Decimal
+
+from fixedwidth.diff import diff
+from fixedwidth.fixedwidth import FixedWidth
+from fixedwidth.tests.test_aggregate import CONFIG
+
+OLD = (
+    "NY 000100012.50 0.10\n"
+    "LA 000200100.25     \n"
+    "NY 000300001.00 1.00\n"
+    "SF 000500009.99     \n"
+)
+
+NEW = (
+    "NY 000300001.00 1.00\n"
+    "NY 000100012.75 0.10\n"
+    "SF 000500009.99     \n"
+    "LA 000600003.00     \n"
+    "LA 000200100.25     \n"
+)
+
+
+class TestDiff(unittest.TestCase):
+    """
+    Test of record-level differences.
+    """
+
+    def setUp(self):
+        self.fw_obj = FixedWidth(CONFIG, line_end='\n')
+
+    def check(self, entries):
+        self.assertEqual([(x.kind, x.key) for x in entries], [
+            ('changed', 1), ('changed', 3), ('removed', 5), ('added', 6)])
+        self.assertEqual(entries[0].changes, {'amount': (Decimal('12.50'), Decimal('12.75'))})
+        self.assertEqual(entries[1].changes, {'branch': ('NY', 'LA')})
+        self.assertEqual(entries[1].old['amount'], Decimal('1.00'))
+        self.assertEqual(entries[2].new, None)
+        self.assertEqual(entries[3].new['branch'], 'LA')
+
+    def test_diff(self):
+        # account 3 moved from NY to LA and account 5 was closed
+        new = NEW.replace("NY 0003", "LA 0003").replace("SF 000500009.99     \n", "")
+        self.check(list(diff(self.fw_obj, io.StringIO(OLD), io.StringIO(new), ['account'])))
+        entries = diff(self.fw_obj, io.BytesIO(OLD.encode('ascii')),
+                       io.BytesIO(new.encode('ascii')), ['account'], run_records=2,
+                       chunk_size=5)
+        self.check(list(entries))
+
+    def test_compound_key(self):
+        entries = list(diff(self.fw_obj, io.StringIO(OLD), io.StringIO(NEW),
+                            ['branch', 'account'], run_records=1))
+        self.assertEqual([(x.kind, x.key) for x in entries], [
+            ('added', ('LA', 6)), ('changed', ('NY', 1))])
+        self.assertEqual(list(diff(self.fw_obj, io.StringIO(OLD), io.StringIO(OLD),
+                                   ['account'])), [])
+
+    def test_errors(self):
+        self.assertRaises(ValueError, list, diff(
+            self.fw_obj, io.StringIO(OLD), io.StringIO(NEW), ['tax']))
+        self.assertRaises(ValueError, list, diff(
+            self.fw_obj, io.StringIO(OLD), io.BytesIO(b''), ['account']))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+"""
+Tests for the MultiLayout class.
+"""
+import io
+import unittest
+from decimal import Decimal
+
+from fixedwidth.fixedwidth import FixedWidth
+from fixedwidth.multi import MultiLayout, Totals
+
+
+def field(field_type, start_pos, length, **extra):
+    alignment = 'left' if field_type == 'string' else 'right'
+    padding = ' ' if field_type == 'string' else '0'
+    return dict(dict(required=True, type=field_type, start_pos=start_pos, length=length,
+                     alignment=alignment, padding=padding), **extra)
+
+
+HEADER = {
+    'kind': field('string', 1, 1, value='H'),
+    'name': field('string', 2, 10),
+}
+
+DETAIL = {
+    'kind': field('string', 1, 1, value='D'),
+    'account': field('integer', 2, 6),
+    'amount': field('decimal', 8, 9, precision=2),
+}
+
+TRAILER = {
+    'kind': field('string', 1, 1, value='T'),
+    'count': field('integer', 2, 6),
+    'total': field('decimal', 8, 12, precision=2),
+}
+
+
+class TestMultiLayout(unittest.TestCase):
+    """
+    Test of files with several record types.
+    """
+
+    def setUp(self):
+        self.layouts = MultiLayout(1, 1, {
+            'H': FixedWidth(HEADER, line_end='\n'),
+            'D': FixedWidth(DETAIL, line_end='\n'),
+            'T': FixedWidth(TRAILER, line_end='\n'),
+        })
+        self.text = (
+            "HPAYROLL   \n"
+            "D000001000012.50\n"
+            "D000002000100.25\n"
+            "T000002000000112.75\n"
+        )
+
+    def test_write_records(self):
+        totals = Totals({'D': ['amount']})
+
+        def records():
+            yield 'H', {'name': 'PAYROLL'}
+            yield 'D', {'account': 1, 'amount': Decimal('12.5')}
+            yield 'D', {'account': 2, 'amount': Decimal('100.25')}
+            yield 'T', {'count': totals.counts['D'], 'total': totals.sums['D', 'amount']}
+
+        output = io.StringIO()
+        self.assertEqual(self.layouts.write_records(records(), output, totals), 4)
+        self.assertEqual(output.getvalue(), self.text)
+        self.assertRaises(ValueError, self.layouts.write_records, [('X', {})], io.StringIO())
+
+    def test_iter_records(self):
+        for data in (io.StringIO(self.text), io.BytesIO(self.text.encode('ascii'))):
+            totals = Totals({'D': ['amount']})
+            records = list(self.layouts.iter_records(data, totals, chunk_size=7))
+            self.assertEqual([x[0] for x in records], ['H', 'D', 'D', 'T'])
+            self.assertEqual(records[2][1]['amount'], Decimal('100.25'))
+            self.assertEqual(records[3][1]['total'], totals.sums['D', 'amount'])
+            self.assertEqual(totals.counts, {'H': 1, 'D': 2, 'T': 1})
+
+        records = self.layouts.iter_records(io.StringIO(self.text), fields={'D': ['amount']})
+        self.assertEqual(list(records)[1], ('D', {'amount': Decimal('12.50')}))
+
+        bad = io.StringIO(self.text + "X\n")
+        self.assertRaises(ValueError, list, self.layouts.iter_records(bad))
+
+    def test_other_records(self):
+        layouts = MultiLayout(1, 1, {
+            'D': FixedWidth(DETAIL, line_end='\n'),
+            None: FixedWidth({'text': field('string', 1, 16)}, line_end='\n'),
+        })
+        records = list(layouts.iter_records(io.BytesIO(b"D000001000012.50\nX comment\n")))
+        self.assertEqual(records[1], ('X', {'text': 'X comment'}))
+
+    def test_config_errors(self):
+        self.assertRaises(ValueError, MultiLayout, 1, 2, {'H': FixedWidth(HEADER)})
+        self.assertRaises(ValueError, MultiLayout, 1, 1, {
+            'H': FixedWidth(HEADER), 'D': FixedWidth(DETAIL, line_end='\n')})
+        self.assertRaises(ValueError, MultiLayout, 1, 1, {
+            'H': FixedWidth(HEADER, line_end=''), 'D': FixedWidth(DETAIL, line_end='')})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+"""
+Tests for parallel parsing.
+"""
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from copy import deepcopy
+
+from fixedwidth.fixedwidth import FixedWidth
+from fixedwidth import parallel
+from fixedwidth.tests.test_core import SAMPLE_CONFIG
+
+LINE = (
+    "Michael   Smith                              "
+    "032vegetarian             40.7128   -74.0059-100   98.6201701011.000        "
+)
+
+
+class TestParallel(unittest.TestCase):
+    """
+    Test of parallel.iter_records and parallel.parse_file.
+    """
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'input.txt')
+        self.fw_obj = FixedWidth(deepcopy(SAMPLE_CONFIG))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def write(self, lines):
+        with open(self.path, 'wb') as outfile:
+            outfile.write(lines.encode('ascii'))
+
+    def test_matches_serial(self):
+        """
+        Parallel results are the same records, in the same order.
+        """
+
+        lines = [LINE.replace('032', '%03d' % x) for x in range(250)]
+        self.write('\r\n'.join(lines))
+
+        with io.open(self.path, newline='') as infile:
+            expected = list(self.fw_obj.iter_records(infile))
+        records = list(parallel.iter_records(
+            self.fw_obj, self.path, processes=2, shard_records=7))
+        self.assertEqual(len(records), 250)
+        self.assertEqual(records, expected)
+
+        ages = []
+        count = parallel.parse_file(
+            self.fw_obj, self.path, callback=lambda x: ages.append(x['age']),
+            processes=2, shard_records=100)
+        self.assertEqual(count, 250)
+        self.assertEqual(ages, list(range(250)))
+
+        records = parallel.parse_file(
+            self.fw_obj, self.path, fields=['age'], processes=2, shard_records=100)
+        self.assertEqual(records[-1], {'age': 249})
+
+    def test_partial_record(self):
+        """
+        A file that is not a whole number of records is rejected.
+        """
+
+        self.write(LINE + '\r\n' + LINE[:50])
+        self.assertRaises(
+            ValueError, parallel.parse_file, self.fw_obj, self.path, processes=1)
+        # reported when called, before any record is read
+        self.assertRaises(
+            ValueError, parallel.iter_records, self.fw_obj, self.path, processes=1)
+        self.write(LINE)
+        self.assertRaises(ValueError, parallel.iter_records, self.fw_obj, self.path,
+                          fields=['nope'], processes=1)
+
+
+if __name__ == '__main__':
+    unittest.main()
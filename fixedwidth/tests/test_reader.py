@@ -0,0 +1,75 @@
+"""
+Tests for the FixedWidthFile class.
+"""
+import gc
+import os
+import shutil
+import tempfile
+import unittest
+import warnings
+from copy import deepcopy
+from decimal import Decimal
+
+from fixedwidth.fixedwidth import FixedWidth
+from fixedwidth.reader import FixedWidthFile
+from fixedwidth.tests.test_core import SAMPLE_CONFIG
+from fixedwidth.tests.test_parallel import LINE
+
+
+class TestFixedWidthFile(unittest.TestCase):
+    """
+    Test of random access to records.
+    """
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'input.txt')
+        self.fw_obj = FixedWidth(deepcopy(SAMPLE_CONFIG))
+        lines = [LINE.replace('032', '%03d' % x) for x in range(20)]
+        with open(self.path, 'wb') as outfile:
+            outfile.write('\r\n'.join(lines).encode('ascii'))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_indexing(self):
+        """
+        Index and slice records.
+        """
+
+        with FixedWidthFile(self.fw_obj, self.path) as records:
+            self.assertEqual(len(records), 20)
+            self.assertEqual(records[0]['age'], 0)
+            self.assertEqual(records[-1]['age'], 19)
+            self.assertEqual(records[5]['latitude'], Decimal('40.7128'))
+            self.assertEqual([x['age'] for x in records[3:9:2]], [3, 5, 7])
+            self.assertEqual(len(list(records)), 20)
+            self.assertRaises(IndexError, records.__getitem__, 20)
+
+    def test_fields(self):
+        """
+        Decode only the requested fields.
+        """
+
+        with FixedWidthFile(self.fw_obj, self.path, fields=['age', 'last_name']) as records:
+            self.assertEqual(records[7], {'age': 7, 'last_name': 'Smith'})
+
+        self.assertRaises(
+            ValueError, FixedWidthFile, self.fw_obj, self.path, fields=['nope'])
+
+    def test_bad_size(self):
+        """
+        A file that is not a whole number of records is rejected and closed.
+        """
+
+        with open(self.path, 'ab') as outfile:
+            outfile.write(b'extra')
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            self.assertRaises(ValueError, FixedWidthFile, self.fw_obj, self.path)
+            gc.collect()
+        self.assertEqual([x for x in caught if issubclass(x.category, ResourceWarning)], [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+"""
+Tests for the sort_file function.
+"""
+import io
+import unittest
+
+from fixedwidth.fixedwidth import FixedWidth
+from fixedwidth.sort import sort_file
+from fixedwidth.tests.test_aggregate import CONFIG, TEXT
+
+
+class TestSort(unittest.TestCase):
+    """
+    Test of external sorting by key fields.
+    """
+
+    def setUp(self):
+        self.fw_obj = FixedWidth(CONFIG, line_end='\n')
+        # accounts 1 to 40, shuffled, with trailing spaces in some lines
+        self.lines = ["%s %04d%08.2f     " % ('NY' if x % 3 else 'LA', x, x * 1.5)
+                      for x in range(1, 41)]
+        self.lines = self.lines[::3] + self.lines[1::3] + self.lines[2::3]
+
+    def expected(self, key):
+        return ''.join(x + '\n' for x in sorted(self.lines, key=key))
+
+    def test_sort(self):
+        text = '\n'.join(self.lines)
+        output = io.StringIO()
+        self.assertEqual(sort_file(self.fw_obj, io.StringIO(text), output, ['account']), 40)
+        self.assertEqual(output.getvalue(), self.expected(lambda x: x[3:7]))
+
+        # stable, and in runs merged from temporary files
+        output = io.BytesIO()
+        sort_file(self.fw_obj, io.BytesIO(text.encode('ascii')), output, ['branch'],
+                  run_records=7, chunk_size=30)
+        self.assertEqual(output.getvalue().decode('ascii'), self.expected(lambda x: x[:3]))
+
+        output = io.StringIO()
+        sort_file(self.fw_obj, io.StringIO(text), output, ['branch', 'amount'],
+                  reverse=True, run_records=6)
+        self.assertEqual(output.getvalue(), self.expected(
+            lambda x: (x[:2] == 'LA', -float(x[7:15]))))
+
+    def test_converted_keys(self):
+        # account ' 004' sorts as 4, and a blank fee (default None) first
+        output = io.StringIO()
+        sort_file(self.fw_obj, io.StringIO(TEXT), output, ['account'])
+        self.assertEqual([x[3:7] for x in output.getvalue().splitlines()],
+                         ['0001', '0002', '0003', ' 004'])
+        output = io.StringIO()
+        sort_file(self.fw_obj, io.StringIO(TEXT), output, ['fee'], run_records=1)
+        self.assertEqual([x[3:7] for x in output.getvalue().splitlines()],
+                         ['0002', ' 004', '0001', '0003'])
+
+    def test_parallel(self):
+        text = '\n'.join(self.lines)
+        output = io.BytesIO()
+        sort_file(self.fw_obj, io.BytesIO(text.encode('ascii')), output, ['account'],
+                  processes=2, run_records=9)
+        self.assertEqual(output.getvalue().decode('ascii'), self.expected(lambda x: x[3:7]))
+
+        # more runs than can be in flight at once
+        output = io.StringIO()
+        sort_file(self.fw_obj, io.StringIO(text), output, ['branch', 'account'],
+                  processes=1, run_records=3)
+        self.assertEqual(output.getvalue(), self.expected(lambda x: (x[:3], x[3:7])))
+
+    def test_unknown_field(self):
+        self.assertRaises(ValueError, sort_file, self.fw_obj, io.StringIO(TEXT),
+                          io.StringIO(), ['tax'])
+
+
+if __name__ == '__main__':
+    unittest.main()
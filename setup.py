@@ -13,6 +13,8 @@ setuptools.setup(
     author_email='shawn@milochik.com',
     url='https://github.com/ShawnMilo/fixedwidth',
     install_requires=['six'],
+    extras_require={'numpy': ['numpy'], 'yaml': ['PyYAML']},
+    entry_points={'console_scripts': ['fixedwidth=fixedwidth.cli:main']},
     license='BSD',
     keywords='fixed width',
     test_suite="fixedwidth.tests",